@@ -39,6 +39,8 @@ SETUP WORKFLOW FOR ACCUCHECK DEVICES:
 
 4. Run this script:
    $ python3 ble_listener.py
+   (first time with an unknown meter: python3 ble_listener.py --discover
+   to list its services and subscribe to everything notifiable)
 
 5. Script will:
    - Connect to device
@@ -72,16 +74,137 @@ If no data is received:
 - Check that all 3 UUIDs are in subscribe_uuids in config.json
 - Set "request_all_records": true in config.json
 - Device must have stored measurements to transfer
+
+Output goes through the logging module; set LOGLEVEL=WARNING to only see
+warnings and errors (readings are still saved to glucose_readings.txt).
+
+If the device is never found while scanning:
+- Scans are filtered by "scan_service_uuids" (Glucose Service by default);
+  set it to [] if your meter does not advertise that service
 """
 
+import argparse
 import asyncio
+import collections
+import configparser
+import glob
 import json
+import logging
+import logging.handlers
 import os
-import subprocess
+import queue
+import re
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from bleak import BleakClient, BleakScanner
 from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
+from bleak.exc import BleakError
+
+try:
+    # dbus-fast is what bleak itself uses to talk to BlueZ on Linux
+    from dbus_fast import BusType, Message, MessageType
+    from dbus_fast.aio import MessageBus
+except ImportError:
+    MessageBus = None
+
+try:
+    # Passive scanning on BlueZ goes through an advertisement monitor, which needs match patterns
+    from bleak.assigned_numbers import AdvertisementDataType
+    from bleak.backends.bluezdbus.advertisement_monitor import OrPattern
+    from bleak.backends.bluezdbus.scanner import BlueZScannerArgs
+    # Match the usual LE flags values, i.e. practically every advertiser; filtering happens in Python
+    _PASSIVE_OR_PATTERNS = [OrPattern(0, AdvertisementDataType.FLAGS, flags) for flags in (b"\x02", b"\x06", b"\x1a")]
+except ImportError:
+    _PASSIVE_OR_PATTERNS = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# D-Bus errors BlueZ answers with when it has no object for the device (never seen or removed)
+_NO_DEVICE_ERRORS = frozenset({
+    "org.freedesktop.DBus.Error.UnknownObject",
+    "org.freedesktop.DBus.Error.UnknownMethod",
+    "org.freedesktop.DBus.Error.InvalidArgs",
+})
+
+# "Paired: yes" style lines in `bluetoothctl info` output; anchored so a device
+# Name/Alias containing such text cannot be mistaken for the real field
+_BLUETOOTHCTL_FLAGS = re.compile(rb"^\s*(Paired|Trusted|Connected):\s*(yes|no)", re.M)
+
+# Parsed config files keyed by (absolute path, mtime), shared across BLEListener instances
+_CONFIG_CACHE = {}
+
+logger = logging.getLogger(__name__)
+
+# Control bytes that never appear in text payloads; lets us skip the UTF-8 decode attempt
+_NON_TEXT_BYTES = re.compile(rb"[\x00-\x08]")
+
+# Glucose Measurement, Glucose Measurement Context and RACP carry binary records, never text
+_BINARY_UUIDS = frozenset({
+    "00002a18-0000-1000-8000-00805f9b34fb",
+    "00002a34-0000-1000-8000-00805f9b34fb",
+    "00002a52-0000-1000-8000-00805f9b34fb",
+})
+
+# Precompiled little-endian unsigned integer unpackers for the fixed-width payload sizes
+_UINT_UNPACK = {size: struct.Struct(fmt).unpack_from
+                for size, fmt in ((1, "<B"), (2, "<H"), (4, "<I"), (8, "<Q"))}
+
+# RACP commands (op code, operator)
+_RACP_REPORT_ALL = b"\x01\x01"    # Report stored records: all records
+_RACP_REPORT_COUNT = b"\x04\x01"  # Report number of stored records: all records
+
+# RACP op codes and response codes, for display
+_RACP_OP_CODES = {
+    1: "Report stored records",
+    2: "Delete stored records",
+    3: "Abort operation",
+    4: "Report number of stored records",
+    5: "Number of stored records response",
+    6: "Response code"
+}
+_RACP_RESPONSE_CODES = {
+    1: "Success",
+    2: "Op code not supported",
+    3: "Invalid operator",
+    4: "Operator not supported",
+    5: "Invalid operand",
+    6: "No records found",
+    7: "Abort unsuccessful",
+    8: "Procedure not completed",
+    9: "Operand not supported"
+}
+
+# Glucose Measurement layout: flags, sequence number, base time (year, month, day, hour, min, sec)
+_GLUCOSE_HEADER = struct.Struct("<BHHBBBBB")
+# Glucose concentration (SFLOAT) followed by the type/sample-location byte
+_GLUCOSE_CONCENTRATION = struct.Struct("<HB")
+_U16 = struct.Struct("<H")
+_I16 = struct.Struct("<h")
+
+# 10 ** exponent for every raw 4-bit SFLOAT exponent (0x8-0xF encode -8..-1)
+_SFLOAT_SCALE = tuple(10 ** (e - 16 if e >= 8 else e) for e in range(16))
+
+# GATT characteristic properties shown in the service dump, as bits
+_PROP_BITS = {"read": 1, "write": 2, "notify": 4, "indicate": 8}
+_PROP_TAGS = ("READ", "WRITE", "NOTIFY", "INDICATE")
+_NOTIFY_BITS = _PROP_BITS["notify"] | _PROP_BITS["indicate"]
+
+# Delay between reconnect attempts, doubled after every failed attempt (seconds)
+_RECONNECT_BACKOFF_MIN = 0.5
+_RECONNECT_BACKOFF_MAX = 30
+
+# Banner separators
+_SEP60 = "=" * 60
+_BANG60 = "!" * 60
 
 
 class BLEListener:
@@ -94,169 +217,574 @@ class BLEListener:
         self.wait_for_device = self.config.get("wait_for_device", True)
         self.discover_services = self.config.get("discover_services", False)
         self.subscribe_uuids = self.config.get("subscribe_uuids", [])
+        # Lowercased and de-duplicated once (a repeated UUID would only issue a second StartNotify)
+        self._subscribe_uuids_lc = tuple(dict.fromkeys(uuid.lower() for uuid in self.subscribe_uuids))
         self.minimal_mode = self.config.get("minimal_mode", True)
         self.request_all_records = self.config.get("request_all_records", False)
+        self.adapter = self.config.get("adapter", "hci0")
+        self.verbose = self.config.get("verbose", True)
+        self.min_conn_interval_us = self.config.get("min_conn_interval_us")
+        self.max_conn_interval_us = self.config.get("max_conn_interval_us")
+        self.scan_service_uuids = self.config.get("scan_service_uuids", [])
+        self.passive_scan = self.config.get("passive_scan", True)
+        self.gatt_cache_file = self.config.get("gatt_cache_file", os.path.expanduser("~/.cache/accuchek/gatt.json"))
+        self.flush_interval_ms = self.config.get("flush_interval_ms", 50)
+        self.reconnect = self.config.get("reconnect", False)
+        # Service UUIDs resolved on the first connection; later connects only resolve these
+        self._cached_service_uuids = None
+        # Adapter-wide debugfs (conn_min_interval, conn_max_interval) from before tuning, restored by close()
+        self._saved_conn_interval = None
+        # Set by --discover: ignore the GATT cache and walk the full table again
+        self.rediscover = False
         self.client = None
         
+        # System D-Bus connection, opened on first use and reused afterwards; the lock keeps
+        # concurrent first callers (scan and pairing check run together) on one connection
+        self._bus = None
+        self._bus_lock = asyncio.Lock()
+        
+        # One long-lived scanner shared by scan_for_device() and wait_for_device_ready();
+        # _seen maps lowercase address -> (device, rssi, time.monotonic() of last advertisement)
+        self._scanner = None
+        self._scanning = False
+        self._seen = {}
+        self._target_seen = asyncio.Event()
+        self._target_device = None
+        
+        # Resolved by on_disconnect() when bleak reports that the link went down
+        self._disconnected = None
+        self._stopping = False
+        self._records_requested = False
+        self._records_complete = False
+        self._racp_count_received = asyncio.Event()
+        
+        # Notifications are queued by the BLE callback and printed by drain_notifications()
+        self._rx_queue = collections.deque()
+        self._rx_wake = asyncio.Event()
+        # Decoding, formatting and saving run here so the event loop keeps dispatching D-Bus signals
+        self._decode_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ble-decode")
+        # Cached "YYYY-mm-dd HH:MM:SS" for the second last formatted by format_timestamp()
+        self._ts_second = None
+        self._ts_prefix = ""
+        # Per-characteristic decoders keyed by the integer ATT handle, filled in after subscribing
+        self._decoder_by_handle = {}
+        self._glucose_handles = set()
+        self._binary_handles = set()
+        
+        # Glucose Measurement characteristic UUID
+        self.GLUCOSE_MEASUREMENT_UUID = "00002a18-0000-1000-8000-00805f9b34fb"
         # RACP characteristic UUID (for subscription)
         self.RACP_UUID = "00002a52-0000-1000-8000-00805f9b34fb"
-        # RACP handle for write operations
+        # RACP handle for write operations (AccuChek default; replaced by the handle resolved on connect)
         self.RACP_HANDLE = 0x000f
         
         if not self.device_address:
             raise ValueError("MAC address not found in config file")
+        
+        # Normalized once; compared against every advertisement while scanning
+        self._addr_lc = self.device_address.lower()
+        self._name_lc = self.device_name.lower() if self.device_name else None
     
     def load_config(self, config_file):
         """Load configuration from JSON file"""
-        if not os.path.exists(config_file):
-            raise FileNotFoundError(f"Config file '{config_file}' not found. Please create it.")
+        try:
+            # A single stat both checks existence and gives the mtime for the cache key
+            mtime_ns = os.stat(config_file).st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Config file '{config_file}' not found. Please create it.") from None
+        
+        key = (os.path.abspath(config_file), mtime_ns)
+        config = _CONFIG_CACHE.get(key)
+        if config is None:
+            with open(config_file, 'rb') as f:
+                raw = f.read()
+            config = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            _CONFIG_CACHE[key] = config
+        
+        return config
+    
+    async def get_system_bus(self):
+        """Return the cached system D-Bus connection, connecting on first use"""
+        if self._bus is None:
+            async with self._bus_lock:
+                if self._bus is None:
+                    self._bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
+        return self._bus
+    
+    def get_device_path(self, device_address):
+        """Build the BlueZ object path for a device, e.g. /org/bluez/hci0/dev_80_F5_B5_7F_99_0F"""
+        return f"/org/bluez/{self.adapter}/dev_{device_address.upper().replace(':', '_')}"
+    
+    async def close(self):
+        """Stop the scanner and decode thread, restore the connection interval and release the D-Bus connection"""
+        await self.stop_scanner()
+        self.restore_connection_interval()
+        self._decode_pool.shutdown(wait=True)
+        if self._bus is not None:
+            self._bus.disconnect()
+            self._bus = None
+    
+    def print_pairing_status(self, paired, trusted, connected):
+        """Print the pairing status summary"""
+        logger.info(f"\nDevice Pairing Status:")
+        logger.info(f"  Paired: {'✓ Yes' if paired else '✗ No'}")
+        logger.info(f"  Trusted: {'✓ Yes' if trusted else '✗ No'}")
+        logger.info(f"  Connected: {'✓ Yes' if connected else '✗ No'}")
+    
+    async def check_pairing_status(self, device_address, report=True):
+        """Check if device is already paired by reading org.bluez.Device1 over D-Bus"""
+        if MessageBus is None:
+            return await self.check_pairing_status_bluetoothctl(device_address, report)
+        
+        try:
+            bus = await self.get_system_bus()
+            # A single Properties.GetAll round-trip, no introspection
+            reply = await bus.call(Message(
+                destination="org.bluez",
+                path=self.get_device_path(device_address),
+                interface="org.freedesktop.DBus.Properties",
+                member="GetAll",
+                signature="s",
+                body=["org.bluez.Device1"]
+            ))
+        except Exception as e:
+            logger.info(f"\nNote: Could not check pairing status: {e}")
+            return None, None, None
         
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        if reply.message_type == MessageType.ERROR:
+            # BlueZ has no Device1 object for this address yet
+            if reply.error_name in _NO_DEVICE_ERRORS:
+                logger.info(f"\nCouldn't retrieve pairing status (device may not be paired yet)")
+                return False, False, False
+            logger.info(f"\nNote: Could not check pairing status: {reply.error_name}")
+            return None, None, None
+        
+        props = reply.body[0]
+        paired, trusted, connected = (props[key].value if key in props else False
+                                      for key in ("Paired", "Trusted", "Connected"))
+        
+        if report:
+            self.print_pairing_status(paired, trusted, connected)
+        return paired, trusted, connected
     
-    def check_pairing_status(self, device_address):
-        """Check if device is already paired using bluetoothctl"""
+    async def check_pairing_status_bluetoothctl(self, device_address, report=True):
+        """Check if device is already paired using bluetoothctl (fallback without dbus-fast)"""
         try:
-            result = subprocess.run(
-                ['bluetoothctl', 'info', device_address],
-                capture_output=True,
-                text=True,
-                timeout=5
+            # Runs as an asyncio subprocess so the scan started alongside keeps going
+            proc = await asyncio.create_subprocess_exec(
+                'bluetoothctl', 'info', device_address,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
             )
+            try:
+                stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=5)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
             
-            if result.returncode == 0:
-                output = result.stdout
-                paired = "Paired: yes" in output
-                trusted = "Trusted: yes" in output
-                connected = "Connected: yes" in output
-                
-                print(f"\nDevice Pairing Status:")
-                print(f"  Paired: {'✓ Yes' if paired else '✗ No'}")
-                print(f"  Trusted: {'✓ Yes' if trusted else '✗ No'}")
-                print(f"  Connected: {'✓ Yes' if connected else '✗ No'}")
+            if proc.returncode == 0:
+                # One pass over the raw bytes picks up all three flags
+                flags = dict(_BLUETOOTHCTL_FLAGS.findall(stdout))
+                paired = flags.get(b"Paired") == b"yes"
+                trusted = flags.get(b"Trusted") == b"yes"
+                connected = flags.get(b"Connected") == b"yes"
                 
+                if report:
+                    self.print_pairing_status(paired, trusted, connected)
                 return paired, trusted, connected
             else:
-                print(f"\nCouldn't retrieve pairing status (device may not be paired yet)")
+                logger.info(f"\nCouldn't retrieve pairing status (device may not be paired yet)")
                 return False, False, False
                 
         except FileNotFoundError:
-            print(f"\nNote: bluetoothctl not found, skipping pairing status check")
+            logger.info(f"\nNote: bluetoothctl not found, skipping pairing status check")
             return None, None, None
         except Exception as e:
-            print(f"\nNote: Could not check pairing status: {e}")
+            logger.info(f"\nNote: Could not check pairing status: {e}")
             return None, None, None
     
+    def tune_connection_interval(self):
+        """Request a shorter LE connection interval for the next connection (needs root)"""
+        if self.min_conn_interval_us is None or self.max_conn_interval_us is None:
+            return False
+        
+        # The kernel takes intervals in units of 1.25 ms
+        min_units = round(self.min_conn_interval_us / 1250)
+        max_units = round(self.max_conn_interval_us / 1250)
+        debugfs_dir = f"/sys/kernel/debug/bluetooth/{self.adapter}"
+        
+        try:
+            # These settings apply to every LE connection of the adapter, so keep the
+            # originals to put back in close()
+            original = self._saved_conn_interval
+            if original is None:
+                with open(f"{debugfs_dir}/conn_min_interval", 'r') as f:
+                    current_min = int(f.read())
+                with open(f"{debugfs_dir}/conn_max_interval", 'r') as f:
+                    current_max = int(f.read())
+                original = (current_min, current_max)
+            
+            self.write_connection_interval(debugfs_dir, (min_units, max_units), original)
+        except OSError as e:
+            logger.info(f"Note: Could not set connection interval ({e}), using adapter defaults")
+            return False
+        
+        self._saved_conn_interval = original
+        logger.info(f"✓ Requested connection interval: {min_units * 1.25}-{max_units * 1.25} ms")
+        return True
+    
+    def write_connection_interval(self, debugfs_dir, new, current):
+        """Write (min, max) connection interval units to debugfs; on failure put back what was written"""
+        # min > max is rejected, so write in whichever order keeps min <= max
+        settings = [("conn_min_interval", new[0], current[0]), ("conn_max_interval", new[1], current[1])]
+        if new[0] > current[1]:
+            settings.reverse()
+        
+        written = []
+        try:
+            for name, value, previous in settings:
+                with open(f"{debugfs_dir}/{name}", 'w') as f:
+                    f.write(str(value))
+                written.append((name, previous))
+        except OSError:
+            # Never leave the adapter with only one of the two values changed
+            for name, previous in reversed(written):
+                try:
+                    with open(f"{debugfs_dir}/{name}", 'w') as f:
+                        f.write(str(previous))
+                except OSError:
+                    pass
+            raise
+    
+    def restore_connection_interval(self):
+        """Put back the adapter's connection interval from before tune_connection_interval()"""
+        if self._saved_conn_interval is None:
+            return
+        
+        tuned = (round(self.min_conn_interval_us / 1250), round(self.max_conn_interval_us / 1250))
+        debugfs_dir = f"/sys/kernel/debug/bluetooth/{self.adapter}"
+        try:
+            self.write_connection_interval(debugfs_dir, self._saved_conn_interval, tuned)
+        except OSError as e:
+            logger.warning(f"⚠ Could not restore the adapter connection interval ({e})")
+            return
+        
+        self._saved_conn_interval = None
+    
+    def write_connection_parameters(self):
+        """Store the connection interval in BlueZ's info file for the paired device (needs root)"""
+        if self.min_conn_interval_us is None or self.max_conn_interval_us is None:
+            logger.warning("⚠ Set min_conn_interval_us and max_conn_interval_us in config.json first")
+            return False
+        
+        # /var/lib/bluetooth/<adapter address>/<device address>/info exists once the device is paired
+        info_files = glob.glob(f"/var/lib/bluetooth/*/{self.device_address.upper()}/info")
+        if not info_files:
+            logger.warning(f"✗ No BlueZ info file for {self.device_address} (pair the device first)")
+            return False
+        
+        min_units = round(self.min_conn_interval_us / 1250)
+        max_units = round(self.max_conn_interval_us / 1250)
+        
+        for info_file in info_files:
+            info = configparser.ConfigParser(interpolation=None)
+            info.optionxform = str  # keys are case sensitive
+            try:
+                info.read(info_file)
+                if not info.has_section("ConnectionParameters"):
+                    info.add_section("ConnectionParameters")
+                params = info["ConnectionParameters"]
+                params["MinInterval"] = str(min_units)
+                params["MaxInterval"] = str(max_units)
+                params.setdefault("Latency", "0")
+                # Supervision timeout in 10 ms units
+                params.setdefault("Timeout", "200")
+                
+                with open(info_file, 'w') as f:
+                    info.write(f, space_around_delimiters=False)
+            except (OSError, configparser.Error) as e:
+                logger.warning(f"✗ Could not update {info_file}: {e}")
+                return False
+            
+            logger.info(f"✓ Wrote [ConnectionParameters] MinInterval={min_units} MaxInterval={max_units} to {info_file}")
+        
+        logger.info("  Restart bluetoothd (sudo systemctl restart bluetooth) for it to take effect")
+        return True
+    
+    async def lookup_known_device(self):
+        """Return the target device straight from BlueZ's object cache if it is already paired"""
+        if MessageBus is None:
+            return None
+        
+        try:
+            bus = await self.get_system_bus()
+            reply = await bus.call(Message(
+                destination="org.bluez",
+                path="/",
+                interface="org.freedesktop.DBus.ObjectManager",
+                member="GetManagedObjects"
+            ))
+        except Exception:
+            return None
+        
+        if reply.message_type != MessageType.METHOD_RETURN:
+            return None
+        
+        for path, interfaces in reply.body[0].items():
+            device = interfaces.get("org.bluez.Device1")
+            if device is None or not path.startswith(f"/org/bluez/{self.adapter}/"):
+                continue
+            
+            props = {key: variant.value for key, variant in device.items()}
+            if props.get("Address", "").lower() != self._addr_lc or not props.get("Paired"):
+                continue
+            
+            # Same details layout bleak's BlueZ backend uses, so BleakClient can skip its own scan
+            details = {"path": path, "props": props}
+            try:
+                return BLEDevice(props["Address"], props.get("Name"), details, props.get("RSSI", -127))
+            except TypeError:
+                # bleak >= 1.0 dropped the rssi argument
+                return BLEDevice(props["Address"], props.get("Name"), details)
+        
+        return None
+    
+    def is_target_device(self, device, address):
+        """Check whether a scanned device (address already lowercased) is the configured one"""
+        if address == self._addr_lc:
+            return True
+        return bool(self._name_lc and device.name and self._name_lc in device.name.lower())
+    
+    def on_advertisement(self, device, advertisement_data: AdvertisementData):
+        """Detection callback of the shared scanner"""
+        address = device.address.lower()
+        self._seen[address] = (device, advertisement_data.rssi, time.monotonic())
+        if self.is_target_device(device, address):
+            self._target_device = device
+            self._target_seen.set()
+    
+    async def start_scanner(self):
+        """Start the shared scanner (no-op if it is already running)"""
+        if self._scanner is None:
+            # service_uuids becomes a BlueZ discovery filter, so unrelated adverts never reach Python
+            self._scanner = BleakScanner(
+                detection_callback=self.on_advertisement,
+                service_uuids=self.scan_service_uuids or None
+            )
+        if not self._scanning:
+            await self._scanner.start()
+            self._scanning = True
+    
+    async def stop_scanner(self):
+        """Stop the shared scanner (no-op if it is not running)"""
+        if self._scanning:
+            await self._scanner.stop()
+            self._scanning = False
+    
+    async def passive_scan_for_target(self, timeout):
+        """Listen passively (no scan requests) until the target advertises; False if unsupported"""
+        if _PASSIVE_OR_PATTERNS is None:
+            return False
+        
+        scanner = BleakScanner(
+            detection_callback=self.on_advertisement,
+            scanning_mode="passive",
+            bluez=BlueZScannerArgs(or_patterns=_PASSIVE_OR_PATTERNS)
+        )
+        try:
+            await scanner.start()
+        except Exception as e:
+            # Typically bluetoothd running without --experimental (no AdvertisementMonitor support)
+            logger.info(f"Note: Passive scanning unavailable ({e}), using active scanning")
+            return False
+        
+        try:
+            await asyncio.wait_for(self._target_seen.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await scanner.stop()
+        return True
+    
     async def scan_for_device(self):
         """Scan for BLE devices"""
-        print(f"\n{'='*60}")
-        print("Scanning for BLE devices...")
-        print(f"{'='*60}\n")
+        known_device = await self.lookup_known_device()
+        if known_device is not None:
+            logger.info(f"\n✓ Found paired device in BlueZ: {known_device.name or 'Unknown'} ({known_device.address})")
+            logger.info("  Skipping scan")
+            return known_device
         
-        devices = await BleakScanner.discover(timeout=self.scan_timeout)
+        logger.info(f"\n{_SEP60}")
+        logger.info("Scanning for BLE devices...")
+        logger.info(f"{_SEP60}\n")
+        
+        timeout = self.scan_timeout
+        if self.passive_scan and not self._target_seen.is_set():
+            # Give passive scanning half the budget before falling back to active scanning
+            if await self.passive_scan_for_target(timeout / 2):
+                timeout /= 2
+        
+        if not self._target_seen.is_set():
+            await self.start_scanner()
+            try:
+                # Stops waiting as soon as the target advertises
+                await asyncio.wait_for(self._target_seen.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        
+        # Only the matched device is printed; the full list is kept for when the target is missing
+        device = self._target_device
+        if device is not None:
+            if device.address.lower() == self._addr_lc:
+                logger.info(f"✓ Found target device: {device.name or 'Unknown'} ({device.address})")
+            else:
+                logger.info(f"✓ Found target device by name: {device.name} ({device.address})")
+            return device
+        
+        devices = list(self._seen.values())
         
         if not devices:
-            print("No devices found during scan.")
+            logger.info("No devices found during scan.")
             return None
         
-        print(f"Found {len(devices)} device(s):\n")
-        for i, device in enumerate(devices, 1):
-            print(f"{i}. Name: {device.name or 'Unknown'}")
-            print(f"   Address: {device.address}")
-            rssi = getattr(device, 'rssi', None)
+        logger.info(f"Found {len(devices)} device(s):\n")
+        for i, (device, rssi, _) in enumerate(devices, 1):
+            logger.info(f"{i}. Name: {device.name or 'Unknown'}")
+            logger.info(f"   Address: {device.address}")
             if rssi is not None:
-                print(f"   RSSI: {rssi} dBm")
+                logger.info(f"   RSSI: {rssi} dBm")
             else:
-                print(f"   RSSI: Not available")
-            print()
-        
-        # Try to find device by MAC address or name
-        for device in devices:
-            if device.address.lower() == self.device_address.lower():
-                print(f"✓ Found target device: {device.name or 'Unknown'} ({device.address})")
-                return device
-            if self.device_name and device.name and self.device_name.lower() in device.name.lower():
-                print(f"✓ Found target device by name: {device.name} ({device.address})")
-                return device
-        
-        print(f"⚠ Warning: Device with MAC {self.device_address} not found in scan results.")
-        print("Attempting to connect anyway...")
+                logger.info(f"   RSSI: Not available")
+            logger.info("")
+        
+        logger.warning(f"⚠ Warning: Device with MAC {self.device_address} not found in scan results.")
+        logger.info("Attempting to connect anyway...")
         return self.device_address
     
+    def load_gatt_cache(self):
+        """Return the cached GATT information for this device ({} if nothing is cached)"""
+        try:
+            with open(self.gatt_cache_file, 'r') as f:
+                return json.load(f).get(self.device_address.upper(), {})
+        except (OSError, ValueError):
+            return {}
+    
+    def save_gatt_cache(self, entry):
+        """Merge GATT information for this device into the cache file (keyed by MAC)"""
+        try:
+            with open(self.gatt_cache_file, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        
+        cache.setdefault(self.device_address.upper(), {}).update(entry)
+        
+        try:
+            os.makedirs(os.path.dirname(self.gatt_cache_file) or ".", exist_ok=True)
+            with open(self.gatt_cache_file, 'w') as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            logger.info(f"Note: Could not write GATT cache {self.gatt_cache_file}: {e}")
+    
+    def collect_notify_uuids(self, services):
+        """Return the UUIDs of characteristics that notify/indicate, printing the GATT table if verbose"""
+        if not self.verbose:
+            return [char.uuid for service in services for char in service.characteristics
+                    if "notify" in char.properties or "indicate" in char.properties]
+        
+        notify_uuids = []
+        
+        # The whole table goes out as a single log record
+        buf = [f"\n{_SEP60}\nDiscovered Services:\n{_SEP60}\n"]
+        for service in services:
+            buf.append(f"Service UUID: {service.uuid}\n  Description: {service.description}\n  Characteristics:")
+            for char in service.characteristics:
+                # One pass over char.properties instead of an `in` scan per property
+                bits = 0
+                for prop in char.properties:
+                    bits |= _PROP_BITS.get(prop, 0)
+                props = [tag for i, tag in enumerate(_PROP_TAGS) if bits >> i & 1]
+                
+                buf.append(f"    - UUID: {char.uuid}\n      Handle: {char.handle}\n      Properties: {', '.join(props)}")
+                
+                if bits & _NOTIFY_BITS:
+                    notify_uuids.append(char.uuid)
+            buf.append("")
+        
+        logger.info("\n".join(buf))
+        
+        return notify_uuids
+    
+    def get_notify_uuids(self, client):
+        """Return the notifiable characteristics, from the GATT cache or from client.services"""
+        cached = None if self.rediscover else self.load_gatt_cache().get("notify_uuids")
+        if cached:
+            logger.info(f"\nUsing {len(cached)} cached notifiable characteristic(s) from {self.gatt_cache_file}")
+            return cached
+        
+        # client.services was resolved while connecting, so walking it costs no extra round-trips
+        notify_uuids = self.collect_notify_uuids(client.services)
+        self.save_gatt_cache({"notify_uuids": notify_uuids})
+        return notify_uuids
+    
     def decode_glucose_measurement(self, data: bytearray):
         """Decode Glucose Measurement characteristic (0x2A18)"""
         try:
             if len(data) < 10:
                 return "Data too short for glucose measurement"
             
-            # Byte 0: Flags
-            flags = data[0]
+            # Bytes 0-9: Flags, Sequence Number and Base Time, unpacked in one call
+            flags, seq_num, year, month, day, hour, minute, second = _GLUCOSE_HEADER.unpack_from(data)
             time_offset_present = bool(flags & 0x01)
             concentration_and_type_present = bool(flags & 0x02)
             concentration_units = "mmol/L" if (flags & 0x04) else "mg/dL"
             status_annunciation_present = bool(flags & 0x08)
             context_info_follows = bool(flags & 0x10)
             
-            result = []
-            result.append(f"Flags: 0x{flags:02x}")
-            result.append(f"  Units: {concentration_units}")
-            result.append(f"  Context follows: {context_info_follows}")
-            
-            # Bytes 1-2: Sequence Number
-            seq_num = int.from_bytes(data[1:3], byteorder='little')
-            result.append(f"Sequence Number: {seq_num}")
-            
-            # Bytes 3-9: Base Time (year, month, day, hour, min, sec)
-            year = int.from_bytes(data[3:5], byteorder='little')
-            month = data[5]
-            day = data[6]
-            hour = data[7]
-            minute = data[8]
-            second = data[9]
-            result.append(f"Timestamp: {year}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}")
+            # Fixed part in one f-string; optional fields are appended below
+            text = (f"Flags: 0x{flags:02x}\n    Units: {concentration_units}\n    Context follows: {context_info_follows}"
+                    f"\n  Sequence Number: {seq_num}"
+                    f"\n  Timestamp: {year}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}")
             
             offset = 10
             
             # Time Offset (optional, 2 bytes)
             if time_offset_present and len(data) >= offset + 2:
-                time_offset = int.from_bytes(data[offset:offset+2], byteorder='little', signed=True)
-                result.append(f"Time Offset: {time_offset} minutes")
+                time_offset, = _I16.unpack_from(data, offset)
+                text += f"\n  Time Offset: {time_offset} minutes"
                 offset += 2
             
             # Glucose Concentration (optional, 3 bytes: 2 for value, 1 for type/location)
             if concentration_and_type_present and len(data) >= offset + 3:
-                # SFLOAT format (2 bytes)
-                glucose_raw = int.from_bytes(data[offset:offset+2], byteorder='little')
+                # SFLOAT format (2 bytes) + type/location (1 byte)
+                glucose_raw, type_sample_location = _GLUCOSE_CONCENTRATION.unpack_from(data, offset)
                 
                 # Decode SFLOAT: 4-bit exponent, 12-bit mantissa
-                exponent = (glucose_raw >> 12) & 0x0F
-                if exponent >= 0x08:  # negative exponent
-                    exponent = -(0x10 - exponent)
                 mantissa = glucose_raw & 0x0FFF
                 if mantissa >= 0x0800:  # negative mantissa
-                    mantissa = -(0x1000 - mantissa)
+                    mantissa -= 0x1000
                 
-                glucose_value = mantissa * (10 ** exponent)
+                glucose_value = mantissa * _SFLOAT_SCALE[glucose_raw >> 12]
                 
-                type_sample_location = data[offset + 2]
                 sample_type = (type_sample_location >> 4) & 0x0F
                 sample_location = type_sample_location & 0x0F
                 
-                result.append(f"🩸 GLUCOSE: {glucose_value} {concentration_units}")
-                result.append(f"Sample Type: {sample_type}, Location: {sample_location}")
+                text += (f"\n  🩸 GLUCOSE: {glucose_value} {concentration_units}"
+                         f"\n  Sample Type: {sample_type}, Location: {sample_location}")
                 offset += 3
             
             # Status Annunciation (optional, 2 bytes)
             if status_annunciation_present and len(data) >= offset + 2:
-                status = int.from_bytes(data[offset:offset+2], byteorder='little')
-                result.append(f"Status: 0x{status:04x}")
+                status, = _U16.unpack_from(data, offset)
+                text += f"\n  Status: 0x{status:04x}"
             
-            return "\n  ".join(result)
+            return text
         except Exception as e:
             return f"Decode error: {e}"
     
     def save_glucose_reading_to_file(self, glucose_value, units, timestamp, seq_num=None, filename="glucose_readings.txt"):
-        """Save glucose reading to a file"""
+        """Save glucose reading to a file, returning a status line for the notification log"""
         try:
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
@@ -266,11 +794,9 @@ class BLEListener:
                 else:
                     f.write(f"[{current_time}] Reading: {glucose_value} {units} (Measured: {timestamp})\n")
             
-            print(f"  💾 Saved to {filename}")
-            return True
+            return f"  💾 Saved to {filename}"
         except Exception as e:
-            print(f"  ⚠ Failed to save reading to file: {e}")
-            return False
+            return f"  ⚠ Failed to save reading to file: {e}"
     
     def decode_racp_response(self, data: bytearray):
         """Decode Record Access Control Point (RACP) response"""
@@ -279,409 +805,631 @@ class BLEListener:
                 return "Data too short for RACP response"
             
             op_code = data[0]
-            operator = data[1] if len(data) > 1 else 0
-            
-            op_codes = {
-                1: "Report stored records",
-                2: "Delete stored records",
-                3: "Abort operation",
-                4: "Report number of stored records",
-                5: "Number of stored records response",
-                6: "Response code"
-            }
+            operator = data[1]
             
-            result = []
-            result.append(f"Op Code: {op_codes.get(op_code, f'Unknown ({op_code})')}")
-            result.append(f"Operator: {operator}")
+            text = f"Op Code: {_RACP_OP_CODES.get(op_code, f'Unknown ({op_code})')}\n  Operator: {operator}"
             
             # If it's a response code (op code 6)
             if op_code == 6 and len(data) >= 4:
                 request_op_code = data[2]
                 response_code_value = data[3]
-                
-                response_codes = {
-                    1: "Success",
-                    2: "Op code not supported",
-                    3: "Invalid operator",
-                    4: "Operator not supported",
-                    5: "Invalid operand",
-                    6: "No records found",
-                    7: "Abort unsuccessful",
-                    8: "Procedure not completed",
-                    9: "Operand not supported"
-                }
-                
-                result.append(f"Request Op Code: {op_codes.get(request_op_code, f'Unknown ({request_op_code})')}")
-                result.append(f"Response: {response_codes.get(response_code_value, f'Unknown ({response_code_value})')}")
+                text += (f"\n  Request Op Code: {_RACP_OP_CODES.get(request_op_code, f'Unknown ({request_op_code})')}"
+                         f"\n  Response: {_RACP_RESPONSE_CODES.get(response_code_value, f'Unknown ({response_code_value})')}")
             
             # If it's number of records response (op code 5)
             elif op_code == 5 and len(data) >= 4:
-                num_records = int.from_bytes(data[2:4], byteorder='little')
-                result.append(f"📊 Number of stored records: {num_records}")
+                num_records, = _U16.unpack_from(data, 2)
+                text += f"\n  📊 Number of stored records: {num_records}"
             
-            return "\n  ".join(result)
+            return text
         except Exception as e:
             return f"Decode error: {e}"
     
     def notification_handler(self, sender: BleakGATTCharacteristic, data: bytearray):
         """Handle notifications/readings from BLE device"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        
-        print(f"\n{'!'*60}")
-        print(f"🔔 DATA RECEIVED!")
-        print(f"{'!'*60}")
-        print(f"[{timestamp}] Notification from {sender.uuid}")
-        print(f"  Characteristic UUID: {sender.uuid}")
-        print(f"  Handle: {sender.handle}")
-        print(f"  Data (hex): {data.hex()}")
-        print(f"  Data (bytes): {data}")
-        print(f"  Data (raw): {list(data)}")
-        
-        # Try to decode as glucose measurement
-        if sender.uuid.lower() == "00002a18-0000-1000-8000-00805f9b34fb":
-            print(f"\n  📊 GLUCOSE MEASUREMENT DECODED:")
-            decoded = self.decode_glucose_measurement(data)
-            print(f"  {decoded}")
-            
-            # Extract and save glucose reading to file
-            try:
-                # Parse the glucose data
-                if len(data) >= 10:
-                    flags = data[0]
-                    concentration_and_type_present = bool(flags & 0x02)
-                    concentration_units = "mmol/L" if (flags & 0x04) else "mg/dL"
-                    time_offset_present = bool(flags & 0x01)
-                    
-                    # Sequence number
-                    seq_num = int.from_bytes(data[1:3], byteorder='little')
+        # Keep the callback O(1): formatting and file I/O happen on the decode thread.
+        # bleak hands every callback a freshly built bytearray, so it can be queued without a copy.
+        self._rx_queue.append((time.time_ns(), sender.handle, sender.uuid, data))
+        self._rx_wake.set()
+        # RACP "number of stored records" response (op code 5) releases the report-all request
+        if sender.handle == self.RACP_HANDLE and data and data[0] == 0x05:
+            self._racp_count_received.set()
+        # Response code (op code 6) to report-stored-records (op code 1): success or no records ends the transfer
+        elif sender.handle == self.RACP_HANDLE and len(data) >= 4 and data[0] == 0x06 and data[2] == 0x01:
+            self._records_complete = data[3] in (0x01, 0x06)
+    
+    async def drain_notifications(self):
+        """Background task handing queued notifications to the decode thread in batches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._rx_wake.wait()
+            # Let a burst of notifications pile up so it goes out as one write
+            if self.flush_interval_ms:
+                await asyncio.sleep(self.flush_interval_ms / 1000)
+            self._rx_wake.clear()
+            await loop.run_in_executor(self._decode_pool, self.flush_notifications)
+    
+    def flush_notifications(self):
+        """Process every queued notification and log them as a single record"""
+        # Quiet mode (LOGLEVEL=WARNING or above): save readings, skip all formatting
+        if not logger.isEnabledFor(logging.INFO):
+            while self._rx_queue:
+                _, handle, _, data = self._rx_queue.popleft()
+                if handle in self._glucose_handles:
+                    self.save_glucose_notification(data)
+            return
+        
+        chunks = []
+        while self._rx_queue:
+            chunks.append(self.format_notification(*self._rx_queue.popleft()))
+        
+        if chunks:
+            # Written to stdout by the logging QueueListener thread, not the event loop
+            logger.info("".join(chunks).rstrip("\n"))
+    
+    def save_glucose_notification(self, data: bytearray):
+        """Save the reading carried by a Glucose Measurement notification, returning a status line"""
+        try:
+            # Parse the glucose data
+            if len(data) >= 10:
+                # Flags, sequence number and timestamp
+                flags, seq_num, year, month, day, hour, minute, second = _GLUCOSE_HEADER.unpack_from(data)
+                concentration_and_type_present = bool(flags & 0x02)
+                concentration_units = "mmol/L" if (flags & 0x04) else "mg/dL"
+                time_offset_present = bool(flags & 0x01)
+                timestamp_str = f"{year}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
+                
+                # Extract glucose value if present
+                offset = 10
+                if time_offset_present and len(data) >= offset + 2:
+                    offset += 2
+                
+                if concentration_and_type_present and len(data) >= offset + 3:
+                    glucose_raw, = _U16.unpack_from(data, offset)
                     
-                    # Timestamp
-                    year = int.from_bytes(data[3:5], byteorder='little')
-                    month = data[5]
-                    day = data[6]
-                    hour = data[7]
-                    minute = data[8]
-                    second = data[9]
-                    timestamp_str = f"{year}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
+                    # Decode SFLOAT
+                    mantissa = glucose_raw & 0x0FFF
+                    if mantissa >= 0x0800:
+                        mantissa -= 0x1000
                     
-                    # Extract glucose value if present
-                    offset = 10
-                    if time_offset_present and len(data) >= offset + 2:
-                        offset += 2
+                    glucose_value = mantissa * _SFLOAT_SCALE[glucose_raw >> 12]
                     
-                    if concentration_and_type_present and len(data) >= offset + 3:
-                        glucose_raw = int.from_bytes(data[offset:offset+2], byteorder='little')
-                        
-                        # Decode SFLOAT
-                        exponent = (glucose_raw >> 12) & 0x0F
-                        if exponent >= 0x08:
-                            exponent = -(0x10 - exponent)
-                        mantissa = glucose_raw & 0x0FFF
-                        if mantissa >= 0x0800:
-                            mantissa = -(0x1000 - mantissa)
-                        
-                        glucose_value = mantissa * (10 ** exponent)
-                        
-                        # Save to file
-                        self.save_glucose_reading_to_file(glucose_value, concentration_units, timestamp_str, seq_num)
-            except Exception as e:
-                print(f"  ⚠ Could not save reading to file: {e}")
+                    # Save to file
+                    return self.save_glucose_reading_to_file(glucose_value, concentration_units, timestamp_str, seq_num)
+        except Exception as e:
+            return f"  ⚠ Could not save reading to file: {e}"
+        
+        return None
+    
+    def format_timestamp(self, time_ns):
+        """Format a time.time_ns() value as 'YYYY-mm-dd HH:MM:SS.mmm'"""
+        seconds, nanos = divmod(time_ns, 1_000_000_000)
+        # The date/time part only changes once a second, so reuse it within the same second
+        if seconds != self._ts_second:
+            self._ts_second = seconds
+            self._ts_prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
+        return f"{self._ts_prefix}.{nanos // 1_000_000:03d}"
+    
+    def format_glucose_measurement(self, data: bytearray, out):
+        """Append the decoded glucose measurement to out and save the reading"""
+        out.append(f"\n  📊 GLUCOSE MEASUREMENT DECODED:")
+        decoded = self.decode_glucose_measurement(data)
+        out.append(f"  {decoded}")
         
-        # Try to decode as RACP response
-        elif sender.uuid.lower() == "00002a52-0000-1000-8000-00805f9b34fb":
-            print(f"\n  📋 RACP RESPONSE DECODED:")
-            decoded = self.decode_racp_response(data)
-            print(f"  {decoded}")
+        # Extract and save glucose reading to file
+        status = self.save_glucose_notification(data)
+        if status:
+            out.append(status)
+    
+    def format_racp_response(self, data: bytearray, out):
+        """Append the decoded RACP response to out"""
+        out.append(f"\n  📋 RACP RESPONSE DECODED:")
+        decoded = self.decode_racp_response(data)
+        out.append(f"  {decoded}")
+    
+    def map_notification_handles(self, client, notify_uuids):
+        """Resolve the ATT handles of the subscribed characteristics and key the decoders by them"""
+        cached = self.load_gatt_cache().get("handles", {})
+        handles = {}
+        for uuid in notify_uuids:
+            char = client.services.get_characteristic(uuid)
+            handle = char.handle if char is not None else cached.get(uuid)
+            if handle is not None:
+                handles[uuid] = handle
+        if handles != cached:
+            self.save_gatt_cache({"handles": handles})
         
-        # Try to decode as UTF-8 if possible
-        try:
-            text = data.decode('utf-8')
-            print(f"  Data (text): {text}")
-        except:
-            pass
+        # RACP writes go straight to the handle, with no UUID lookup per command
+        if self.RACP_UUID in handles:
+            self.RACP_HANDLE = handles[self.RACP_UUID]
         
-        # Try to decode as integers if it's small enough
-        if len(data) <= 8:
-            try:
-                if len(data) == 1:
-                    print(f"  Data (uint8): {int.from_bytes(data, byteorder='little')}")
-                elif len(data) == 2:
-                    print(f"  Data (uint16): {int.from_bytes(data, byteorder='little')}")
-                elif len(data) == 4:
-                    print(f"  Data (uint32): {int.from_bytes(data, byteorder='little')}")
-                elif len(data) == 8:
-                    print(f"  Data (uint64): {int.from_bytes(data, byteorder='little')}")
-            except:
-                pass
+        decoders = {
+            self.GLUCOSE_MEASUREMENT_UUID: self.format_glucose_measurement,
+            self.RACP_UUID: self.format_racp_response,
+        }
+        self._decoder_by_handle = {handles[uuid]: decoder for uuid, decoder in decoders.items() if uuid in handles}
+        self._glucose_handles = {handles[self.GLUCOSE_MEASUREMENT_UUID]} if self.GLUCOSE_MEASUREMENT_UUID in handles else set()
+        self._binary_handles = {handle for uuid, handle in handles.items() if uuid in _BINARY_UUIDS}
+    
+    def format_notification(self, received_ns, handle, uuid, data: bytearray):
+        """Decode a queued notification and return the text to print for it"""
+        timestamp = self.format_timestamp(received_ns)
         
-        print("!" * 60)
+        out = []
+        out.append(f"\n{_BANG60}")
+        out.append(f"🔔 DATA RECEIVED!")
+        out.append(f"{_BANG60}")
+        out.append(f"[{timestamp}] Notification from {uuid}")
+        out.append(f"  Characteristic UUID: {uuid}")
+        out.append(f"  Handle: {handle}")
+        if self.verbose:
+            out.append(f"  Data (hex): {data.hex()}")
+            out.append(f"  Data (bytes): {data}")
+            out.append(f"  Data (raw): {data.hex(' ')}")
+        
+        # Glucose measurement / RACP response decoding, looked up by handle; a decoded
+        # payload skips the generic text/integer guesses below
+        decoder = self._decoder_by_handle.get(handle)
+        if decoder is not None:
+            decoder(data, out)
+        
+        elif self.verbose:
+            # Show as text only if it is ASCII without control bytes; both checks are C loops,
+            # so binary payloads never go through a failing decode. Known binary characteristics
+            # skip the checks altogether.
+            if handle not in self._binary_handles and data.isascii() and not _NON_TEXT_BYTES.search(data):
+                out.append(f"  Data (text): {data.decode('ascii')}")
+            
+            # Try to decode as an unsigned integer if it's a fixed-width size
+            unpack = _UINT_UNPACK.get(len(data))
+            if unpack:
+                out.append(f"  Data (uint{len(data) * 8}): {unpack(data)[0]}")
+        
+        out.append(_BANG60)
+        return "\n".join(out) + "\n"
+    
+    def on_disconnect(self, client):
+        """disconnected_callback for BleakClient; safe to call from any thread"""
+        future = self._disconnected
+        if future is not None:
+            future.get_loop().call_soon_threadsafe(_resolve, future)
+    
+    async def heartbeat(self, connected_at):
+        """Print a status line every 10s while connected"""
+        while True:
+            await asyncio.sleep(10)
+            connection_time = int(time.monotonic() - connected_at)
+            logger.info(f"[{datetime.now().strftime('%H:%M:%S')}] ✓ Still connected ({connection_time}s)")
+    
+    def stop(self):
+        """Stop listening (SIGINT handler); leaving the BleakClient context disconnects cleanly"""
+        self._stopping = True
+        self.on_disconnect(None)
     
     async def request_all_stored_records(self, client):
         """Request all stored glucose records via RACP"""
         try:
-            print(f"\n{'='*60}")
-            print("📋 Requesting All Stored Records via RACP")
-            print(f"{'='*60}\n")
+            logger.info(f"\n{_SEP60}")
+            logger.info("📋 Requesting All Stored Records via RACP")
+            logger.info(f"{_SEP60}\n")
             
-            # RACP command: Report all stored records
-            # Op Code: 0x01 (Report stored records)
-            # Operator: 0x01 (All records)
-            command = bytearray([0x01, 0x01])
-            
-            print(f"Writing RACP command: {command.hex()} (Report all stored records)")
-            await client.write_gatt_char(self.RACP_HANDLE, command)
-            print("✓ Command sent successfully!")
-            print("  Waiting for device to send stored glucose measurements...\n")
+            logger.info(f"Writing RACP command: {_RACP_REPORT_ALL.hex()} (Report all stored records)")
+            await client.write_gatt_char(self.RACP_HANDLE, _RACP_REPORT_ALL)
+            logger.info("✓ Command sent successfully!")
+            logger.info("  Waiting for device to send stored glucose measurements...\n")
             
             return True
         except Exception as e:
-            print(f"✗ Failed to request records: {e}")
+            logger.warning(f"✗ Failed to request records: {e}")
             return False
     
     async def request_number_of_records(self, client):
         """Request number of stored glucose records via RACP"""
         try:
-            print(f"\n{'='*60}")
-            print("📊 Requesting Number of Stored Records via RACP")
-            print(f"{'='*60}\n")
-            
-            # RACP command: Report number of stored records
-            # Op Code: 0x04 (Report number of stored records)
-            # Operator: 0x01 (All records)
-            command = bytearray([0x04, 0x01])
+            logger.info(f"\n{_SEP60}")
+            logger.info("📊 Requesting Number of Stored Records via RACP")
+            logger.info(f"{_SEP60}\n")
             
-            print(f"Writing RACP command: {command.hex()} (Report number of records)")
-            await client.write_gatt_char(self.RACP_HANDLE, command)
-            print("✓ Command sent successfully!")
-            print("  Waiting for response...\n")
+            logger.info(f"Writing RACP command: {_RACP_REPORT_COUNT.hex()} (Report number of records)")
+            await client.write_gatt_char(self.RACP_HANDLE, _RACP_REPORT_COUNT)
+            logger.info("✓ Command sent successfully!")
+            logger.info("  Waiting for response...\n")
             
             return True
         except Exception as e:
-            print(f"✗ Failed to request number of records: {e}")
+            logger.warning(f"✗ Failed to request number of records: {e}")
             return False
     
     async def wait_for_device_ready(self, device_address, max_attempts=10):
         """Wait for device to become discoverable/connectable"""
-        print(f"\n{'='*60}")
-        print("⏳ Waiting for device to become active...")
-        print(f"{'='*60}\n")
-        print("IMPORTANT: Make sure your AccuChek device is:")
-        print("  • In pairing/transmission mode (follow device instructions)")
-        print("  • Or actively taking a measurement")
-        print("  • Device must be AWAKE to connect\n")
-        
-        for attempt in range(1, max_attempts + 1):
-            print(f"Attempt {attempt}/{max_attempts}: Scanning for active device...")
-            
-            devices = await BleakScanner.discover(timeout=5)
-            for device in devices:
-                if device.address.lower() == device_address.lower():
-                    print(f"✓ Device found and active: {device.name or 'Unknown'}")
-                    return True
-            
-            if attempt < max_attempts:
-                print(f"  Device not found yet, waiting 3 seconds...")
-                print(f"  (Make sure device is in active/pairing mode!)\n")
-                await asyncio.sleep(3)
-        
-        print(f"\n⚠ Device not found after {max_attempts} attempts")
-        print("The device may be sleeping. Please activate it and try again.")
-        return False
+        logger.info(f"\n{_SEP60}")
+        logger.info("⏳ Waiting for device to become active...")
+        logger.info(f"{_SEP60}\n")
+        logger.info("IMPORTANT: Make sure your AccuChek device is:")
+        logger.info("  • In pairing/transmission mode (follow device instructions)")
+        logger.info("  • Or actively taking a measurement")
+        logger.info("  • Device must be AWAKE to connect\n")
+        
+        # The shared scanner may already have heard from the device moments ago
+        seen = self._seen.get(device_address.lower())
+        if seen and time.monotonic() - seen[2] < self.scan_timeout:
+            logger.info(f"✓ Device found and active: {seen[0].name or 'Unknown'}")
+            return True
+        
+        # Same overall budget as the old polling loop (5s scan + 3s pause per attempt)
+        timeout = max_attempts * 8
+        logger.info(f"Listening for advertisements from {device_address} (up to {timeout}s)...")
+        
+        self._target_seen.clear()
+        await self.start_scanner()
+        try:
+            await asyncio.wait_for(self._target_seen.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"\n⚠ Device not found after {timeout} seconds")
+            logger.info("The device may be sleeping. Please activate it and try again.")
+            return False
+        
+        device, _, _ = self._seen.get(device_address.lower(), (None, None, None))
+        logger.info(f"✓ Device found and active: {getattr(device, 'name', None) or 'Unknown'}")
+        return True
+    
+    async def listen_once(self, device):
+        """Connect, subscribe and listen until the device disconnects; True if subscriptions succeeded"""
+        # Connect with minimal operations
+        if self.minimal_mode:
+            logger.warning("⚠ Using MINIMAL mode - connect once, minimal operations\n")
+        
+        self._disconnected = asyncio.get_running_loop().create_future()
+        
+        if self._cached_service_uuids is None and not self.rediscover:
+            self._cached_service_uuids = self.load_gatt_cache().get("service_uuids")
+        
+        # With services= BlueZ only resolves the listed services instead of the whole GATT table
+        async with BleakClient(device, timeout=30.0, disconnected_callback=self.on_disconnect,
+                               services=self._cached_service_uuids) as client:
+            self.client = client
+            
+            if self._cached_service_uuids is None:
+                service_uuids = [service.uuid for service in client.services]
+                if service_uuids:
+                    self._cached_service_uuids = service_uuids
+                    self.save_gatt_cache({"service_uuids": service_uuids})
+            
+            logger.info(f"✓ Connected successfully!")
+            logger.info(f"  Device: {client.address}")
+            logger.info(f"  Connected: {client.is_connected}")
+            
+            # BlueZ negotiates the ATT MTU itself on connect (up to 517), but bleak only learns the
+            # result on demand; a larger MTU lets RACP dumps pack more per notification
+            acquire_mtu = getattr(getattr(client, "_backend", None), "_acquire_mtu", None)
+            if acquire_mtu is not None:
+                try:
+                    await acquire_mtu()
+                except Exception as e:
+                    logger.info(f"Note: Could not read negotiated MTU ({e})")
+            logger.info(f"  MTU: {client.mtu_size}")
+            
+            # Subscribe to the configured UUIDs, or to everything notifiable when discovering
+            notify_uuids = self._subscribe_uuids_lc
+            if self.discover_services:
+                # bleak already reports characteristic UUIDs in lowercase
+                notify_uuids = tuple(dict.fromkeys(self.get_notify_uuids(client)))
+            racp_subscribed = self.RACP_UUID in notify_uuids
+            
+            subscribed_count = 0
+            if notify_uuids and len(notify_uuids) > 0:
+                logger.info(f"\nAttempting to subscribe to {len(notify_uuids)} UUID(s)...")
+                # Issue all StartNotify calls at once; BlueZ handles them concurrently
+                results = await asyncio.gather(
+                    *(client.start_notify(uuid, self.notification_handler) for uuid in notify_uuids),
+                    return_exceptions=True
+                )
+                for uuid, result in zip(notify_uuids, results):
+                    if isinstance(result, Exception):
+                        logger.warning(f"  Subscribing to {uuid}... ✗ ({result})")
+                    else:
+                        logger.info(f"  Subscribing to {uuid}... ✓")
+                        subscribed_count += 1
+                
+                # Handles are stable for this connection; the BLE callback only carries the handle
+                self.map_notification_handles(client, notify_uuids)
+            
+            # If RACP is subscribed and request_all_records is enabled, request data
+            if racp_subscribed and self.request_all_records and not self._records_requested:
+                self._records_requested = True
+                self._records_complete = False
+                await asyncio.sleep(1)  # Give subscriptions time to settle
+                
+                # First, request number of records
+                self._racp_count_received.clear()
+                await self.request_number_of_records(client)
+                try:
+                    # The count indication normally arrives within tens of milliseconds
+                    await asyncio.wait_for(self._racp_count_received.wait(), timeout=3.0)
+                except asyncio.TimeoutError:
+                    logger.warning("⚠ No record count received, requesting records anyway")
+                
+                # Then request all records
+                await self.request_all_stored_records(client)
+            
+            logger.info(f"\n{_SEP60}")
+            logger.info("📡 LISTENING FOR DATA")
+            logger.info(f"{_SEP60}\n")
+            
+            if subscribed_count > 0:
+                logger.info(f"✓ Subscribed to {subscribed_count} characteristic(s)")
+                logger.info("  Any data from subscribed characteristics will appear below.\n")
+                
+                if self._records_requested and racp_subscribed:
+                    logger.info("✓ RACP requests sent - waiting for glucose data...")
+                    logger.info("  Device will send stored measurements via notifications.\n")
+            else:
+                logger.warning("⚠ No characteristics subscribed.")
+                logger.info("  Connection is idle. Device may not send unsolicited data.\n")
+                logger.info("  To subscribe to specific UUIDs, add them to config.json:")
+                logger.info('    "subscribe_uuids": ["00002a18-...", "00002a52-..."]\n')
+            
+            logger.info("Keeping connection alive. Press Ctrl+C to stop.")
+            logger.info(f"{_SEP60}\n")
+            
+            # Sleep until bleak reports the disconnect or Ctrl+C; the heartbeat runs as its own task
+            connected_at = time.monotonic()
+            connection_time = 0
+            heartbeat_task = asyncio.create_task(self.heartbeat(connected_at))
+            loop = asyncio.get_running_loop()
+            try:
+                loop.add_signal_handler(signal.SIGINT, self.stop)
+            except NotImplementedError:
+                pass  # Windows event loops: Ctrl+C still raises KeyboardInterrupt
+            
+            try:
+                await self._disconnected
+                
+                connection_time = int(time.monotonic() - connected_at)
+                if self._stopping:
+                    logger.info(f"\n\nStopping listener after {connection_time}s...")
+                    return subscribed_count > 0
+                
+                logger.warning(f"\n⚠ Device disconnected after {connection_time} seconds")
+                logger.info(f"{_SEP60}")
+                logger.info(f"Connection lasted: {connection_time}s")
+                if connection_time < 5:
+                    logger.info("Very short connection - device likely rejecting connection")
+                elif connection_time < 30:
+                    logger.info("Connection dropped - device may have timed out")
+                else:
+                    logger.info("Connection held for a while - good sign!")
+                logger.info(f"{_SEP60}\n")
+                    
+            except Exception as e:
+                connection_time = int(time.monotonic() - connected_at)
+                logger.warning(f"\n⚠ Connection lost after {connection_time}s: {e}")
+            finally:
+                heartbeat_task.cancel()
+                # A link lost mid-transfer leaves records behind; ask again on the next connection
+                if not self._records_complete:
+                    self._records_requested = False
+                loop.remove_signal_handler(signal.SIGINT)
+            
+            return subscribed_count > 0
     
     async def connect_and_listen(self):
         """Connect to BLE device and listen for notifications"""
-        device = await self.scan_for_device()
+        # The pairing status read doesn't depend on the scan result, so run both at once
+        device, (paired, trusted, connected) = await asyncio.gather(
+            self.scan_for_device(),
+            self.check_pairing_status(self.device_address, report=False)
+        )
         
         if device is None:
-            print("Cannot proceed without a device.")
+            logger.info("Cannot proceed without a device.")
             return
         
-        device_address = device.address if isinstance(device, type(device)) and hasattr(device, 'address') else device
+        # scan_for_device() returns a BLEDevice, or the configured address string if nothing matched
+        device_address = getattr(device, 'address', device)
         
         # Check pairing status before connecting
-        paired, trusted, connected = self.check_pairing_status(device_address)
+        if device_address.lower() != self._addr_lc:
+            # Matched by name under a different address; read that device's status instead
+            paired, trusted, connected = await self.check_pairing_status(device_address)
+        elif paired is not None:
+            self.print_pairing_status(paired, trusted, connected)
         
         # If device is not currently connected/discoverable, wait for it
         if connected == False or paired == False:
-            print(f"\n{'='*60}")
-            print("⚠ DEVICE NOT CURRENTLY ACTIVE")
-            print(f"{'='*60}")
-            print("\nYour device needs to be AWAKE and in active mode to connect.")
-            print("\nPlease do ONE of the following:")
-            print("  1. Press the pairing/Bluetooth button on your AccuChek")
-            print("  2. Start taking a measurement")
-            print("  3. Access the device menu to keep it awake")
-            print("\n📍 Activate your device NOW...")
-            print(f"{'='*60}\n")
-            
-            # Give user time to activate device
-            print("Waiting 5 seconds for you to activate the device...")
-            await asyncio.sleep(5)
+            logger.info(f"\n{_SEP60}")
+            logger.warning("⚠ DEVICE NOT CURRENTLY ACTIVE")
+            logger.info(f"{_SEP60}")
+            logger.info("\nYour device needs to be AWAKE and in active mode to connect.")
+            logger.info("\nPlease do ONE of the following:")
+            logger.info("  1. Press the pairing/Bluetooth button on your AccuChek")
+            logger.info("  2. Start taking a measurement")
+            logger.info("  3. Access the device menu to keep it awake")
+            logger.info("\n📍 Activate your device NOW...")
+            logger.info(f"{_SEP60}\n")
+            
+            # Give user time to activate device, but carry on as soon as it advertises
+            logger.info("Waiting up to 5 seconds for you to activate the device...")
+            await self.start_scanner()
+            try:
+                await asyncio.wait_for(self._target_seen.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
             
             # Wait for device to appear in scan
             if not await self.wait_for_device_ready(device_address):
-                print("\n✗ Could not find active device. Exiting.")
+                logger.warning("\n✗ Could not find active device. Exiting.")
                 return
         
-        print(f"\n{'='*60}")
-        print(f"Connecting to device: {device_address}")
-        print(f"{'='*60}\n")
+        logger.info(f"\n{_SEP60}")
+        logger.info(f"Connecting to device: {device_address}")
+        logger.info(f"{_SEP60}\n")
+        
+        # Many adapters refuse to connect while discovery is running
+        await self.stop_scanner()
+        
+        # Given a bare address, BleakClient would run a scan of its own before connecting
+        seen = self._seen.get(device_address.lower())
+        if seen is not None:
+            device = seen[0]
+        
+        # Connection interval bounds notification throughput during RACP transfers
+        self.tune_connection_interval()
+        
+        drain_task = asyncio.create_task(self.drain_notifications())
         
         try:
-            # Connect with minimal operations
-            if self.minimal_mode:
-                print("⚠ Using MINIMAL mode - connect once, minimal operations\n")
-            
-            async with BleakClient(device_address, timeout=30.0) as client:
-                self.client = client
-                
-                print(f"✓ Connected successfully!")
-                print(f"  Device: {client.address}")
-                print(f"  Connected: {client.is_connected}")
-                
-                # If we have specific UUIDs to subscribe to, do it now
-                subscribed_count = 0
-                if self.subscribe_uuids and len(self.subscribe_uuids) > 0:
-                    print(f"\nAttempting to subscribe to {len(self.subscribe_uuids)} UUID(s)...")
-                    for uuid in self.subscribe_uuids:
-                        try:
-                            print(f"  Subscribing to {uuid}...", end=" ")
-                            await client.start_notify(uuid, self.notification_handler)
-                            print("✓")
-                            subscribed_count += 1
-                            await asyncio.sleep(0.2)
-                        except Exception as e:
-                            print(f"✗ ({e})")
-                
-                # If RACP is subscribed and request_all_records is enabled, request data
-                if self.RACP_UUID in [u.lower() for u in self.subscribe_uuids] and self.request_all_records:
-                    await asyncio.sleep(1)  # Give subscriptions time to settle
-                    
-                    # First, request number of records
-                    await self.request_number_of_records(client)
-                    await asyncio.sleep(2)  # Wait for response
-                    
-                    # Then request all records
-                    await self.request_all_stored_records(client)
-                    await asyncio.sleep(2)  # Give device time to prepare data
-                
-                print(f"\n{'='*60}")
-                print("📡 LISTENING FOR DATA")
-                print(f"{'='*60}\n")
-                
-                if subscribed_count > 0:
-                    print(f"✓ Subscribed to {subscribed_count} characteristic(s)")
-                    print("  Any data from subscribed characteristics will appear below.\n")
-                    
-                    if self.request_all_records and self.RACP_UUID in [u.lower() for u in self.subscribe_uuids]:
-                        print("✓ RACP requests sent - waiting for glucose data...")
-                        print("  Device will send stored measurements via notifications.\n")
-                else:
-                    print("⚠ No characteristics subscribed.")
-                    print("  Connection is idle. Device may not send unsolicited data.\n")
-                    print("  To subscribe to specific UUIDs, add them to config.json:")
-                    print('    "subscribe_uuids": ["00002a18-...", "00002a52-..."]\n')
-                
-                print("Keeping connection alive. Press Ctrl+C to stop.")
-                print(f"{'='*60}\n")
+            backoff = _RECONNECT_BACKOFF_MIN
+            while True:
+                try:
+                    if await self.listen_once(device):
+                        backoff = _RECONNECT_BACKOFF_MIN
+                except (BleakError, asyncio.TimeoutError, EOFError) as e:
+                    if not self.reconnect:
+                        raise
+                    logger.warning(f"\n⚠ Connection attempt failed: {str(e) or type(e).__name__}")
                 
-                # Just keep connection alive
-                connection_time = 0
-                last_status_time = 0
+                if self._stopping or not self.reconnect:
+                    break
                 
-                try:
-                    while True:
-                        if not client.is_connected:
-                            print(f"\n⚠ Device disconnected after {connection_time} seconds")
-                            print(f"{'='*60}")
-                            print(f"Connection lasted: {connection_time}s")
-                            if connection_time < 5:
-                                print("Very short connection - device likely rejecting connection")
-                            elif connection_time < 30:
-                                print("Connection dropped - device may have timed out")
-                            else:
-                                print("Connection held for a while - good sign!")
-                            print(f"{'='*60}\n")
-                            break
-                        
-                        # Show heartbeat every 10 seconds
-                        if connection_time > 0 and connection_time % 10 == 0 and connection_time != last_status_time:
-                            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✓ Still connected ({connection_time}s)")
-                            last_status_time = connection_time
-                        
-                        await asyncio.sleep(1)
-                        connection_time += 1
-                        
-                except Exception as e:
-                    print(f"\n⚠ Connection lost after {connection_time}s: {e}")
-                    
+                # The cached service UUIDs keep reconnects from re-resolving the whole GATT table
+                logger.info(f"Reconnecting in {backoff:g}s... (Ctrl+C to stop)")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, _RECONNECT_BACKOFF_MAX)
         except asyncio.CancelledError:
-            print("\n\nConnection cancelled by user.")
+            logger.info("\n\nConnection cancelled by user.")
         except EOFError as e:
-            print(f"\n\n✗ Connection Lost (EOFError): Device disconnected unexpectedly")
-            print(f"\n{'='*60}")
-            print("POSSIBLE CAUSES FOR ACCUCHECK DEVICES:")
-            print(f"{'='*60}")
-            print("\n1. Device has a very short connection timeout")
-            print("   - AccuCheck may disconnect if idle for too long")
-            print("   - Try taking a measurement immediately after connecting\n")
-            print("2. Device requires time/date sync or specific handshake")
-            print("   - Some glucose meters need to sync time first")
-            print("   - May need to use manufacturer's app first\n")
-            print("3. Device may be connected to another device/app")
-            print("   - Make sure AccuCheck app is closed on phone")
-            print("   - Make sure no other Bluetooth connections are active\n")
-            print("4. Try this sequence:")
-            print("   a. Put device in pairing mode")
-            print("   b. Start this script")
-            print("   c. IMMEDIATELY take a glucose measurement")
-            print("   d. Device should stay connected during measurement\n")
-            print(f"{'='*60}\n")
+            logger.warning(f"\n\n✗ Connection Lost (EOFError): Device disconnected unexpectedly")
+            logger.info(f"\n{_SEP60}")
+            logger.info("POSSIBLE CAUSES FOR ACCUCHECK DEVICES:")
+            logger.info(f"{_SEP60}")
+            logger.info("\n1. Device has a very short connection timeout")
+            logger.info("   - AccuCheck may disconnect if idle for too long")
+            logger.info("   - Try taking a measurement immediately after connecting\n")
+            logger.info("2. Device requires time/date sync or specific handshake")
+            logger.info("   - Some glucose meters need to sync time first")
+            logger.info("   - May need to use manufacturer's app first\n")
+            logger.info("3. Device may be connected to another device/app")
+            logger.info("   - Make sure AccuCheck app is closed on phone")
+            logger.info("   - Make sure no other Bluetooth connections are active\n")
+            logger.info("4. Try this sequence:")
+            logger.info("   a. Put device in pairing mode")
+            logger.info("   b. Start this script")
+            logger.info("   c. IMMEDIATELY take a glucose measurement")
+            logger.info("   d. Device should stay connected during measurement\n")
+            logger.info(f"{_SEP60}\n")
         except Exception as e:
-            print(f"\n\n✗ Connection Error: {e}")
-            print(f"Error Type: {type(e).__name__}")
+            logger.error(f"\n\n✗ Connection Error: {e}")
+            logger.error(f"Error Type: {type(e).__name__}")
             
             # Provide helpful troubleshooting info
-            print(f"\n{'='*60}")
-            print("TROUBLESHOOTING:")
-            print(f"{'='*60}")
-            print("\nIf you're getting pairing/authentication errors, try:")
-            print("\n1. Remove existing pairing (if any):")
-            print(f"   bluetoothctl")
-            print(f"   remove {device_address}")
-            print(f"   exit")
-            print("\n2. Pair the device manually:")
-            print(f"   bluetoothctl")
-            print(f"   scan on")
-            print(f"   (wait to see your device)")
-            print(f"   scan off")
-            print(f"   pair {device_address}")
-            print(f"   (enter PIN if prompted)")
-            print(f"   trust {device_address}")
-            print(f"   exit")
-            print("\n3. Then run this script again")
-            print(f"\nOther common issues:")
-            print("- Make sure the device is in pairing mode")
-            print("- Make sure the device isn't connected to another device")
-            print("- Try running with sudo if permission errors occur")
-            print(f"{'='*60}\n")
+            logger.info(f"\n{_SEP60}")
+            logger.info("TROUBLESHOOTING:")
+            logger.info(f"{_SEP60}")
+            logger.info("\nIf you're getting pairing/authentication errors, try:")
+            logger.info("\n1. Remove existing pairing (if any):")
+            logger.info(f"   bluetoothctl")
+            logger.info(f"   remove {device_address}")
+            logger.info(f"   exit")
+            logger.info("\n2. Pair the device manually:")
+            logger.info(f"   bluetoothctl")
+            logger.info(f"   scan on")
+            logger.info(f"   (wait to see your device)")
+            logger.info(f"   scan off")
+            logger.info(f"   pair {device_address}")
+            logger.info(f"   (enter PIN if prompted)")
+            logger.info(f"   trust {device_address}")
+            logger.info(f"   exit")
+            logger.info("\n3. Then run this script again")
+            logger.info(f"\nOther common issues:")
+            logger.info("- Make sure the device is in pairing mode")
+            logger.info("- Make sure the device isn't connected to another device")
+            logger.info("- Try running with sudo if permission errors occur")
+            logger.info(f"{_SEP60}\n")
             raise
+        finally:
+            drain_task.cancel()
+            # Print anything that arrived after the last drain pass; the single worker
+            # runs this only after a flush that may still be in progress
+            await asyncio.get_running_loop().run_in_executor(self._decode_pool, self.flush_notifications)
+
+
+def _resolve(future):
+    """Complete a future unless it is already done"""
+    if not future.done():
+        future.set_result(None)
+
+
+def setup_logging():
+    """Log to stdout from a background thread; the level comes from $LOGLEVEL (default INFO)"""
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    
+    # getLevelName() maps a known level name to its number; anything else would make basicConfig raise
+    level = os.environ.get("LOGLEVEL", "INFO").upper()
+    valid = isinstance(logging.getLevelName(level), int)
+    logging.basicConfig(level=level if valid else logging.INFO, handlers=[queue_handler])
+    log_thread = logging.handlers.QueueListener(records, stream_handler)
+    log_thread.start()
+    if not valid:
+        logger.warning(f"⚠ Unknown LOGLEVEL {os.environ['LOGLEVEL']!r}, using INFO")
+    return log_thread
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Listen for glucose readings from an AccuChek meter over BLE")
+    parser.add_argument("--config", default="config.json", help="path to the config file (default: config.json)")
+    parser.add_argument("--discover", action="store_true",
+                        help="walk the full GATT table and subscribe to every notifiable characteristic "
+                             "instead of subscribe_uuids (first-time setup; refreshes the GATT cache)")
+    parser.add_argument("--write-conn-params", action="store_true",
+                        help="store min/max_conn_interval_us in BlueZ's info file for the paired device "
+                             "so every connection uses them, then exit (needs root)")
+    return parser.parse_args()
 
 
 async def main():
     """Main entry point"""
+    args = parse_args()
+    log_thread = setup_logging()
     try:
-        listener = BLEListener()
-        await listener.connect_and_listen()
+        listener = BLEListener(args.config)
+        if args.write_conn_params:
+            return 0 if listener.write_connection_parameters() else 1
+        if args.discover:
+            listener.discover_services = True
+            listener.rediscover = True
+        try:
+            await listener.connect_and_listen()
+        finally:
+            await listener.close()
     except KeyboardInterrupt:
-        print("\n\nStopping listener...")
+        logger.info("\n\nStopping listener...")
     except Exception as e:
-        print(f"\n\nFatal error: {e}")
+        logger.error(f"\n\nFatal error: {e}")
         return 1
+    finally:
+        # Flushes anything still queued for stdout
+        log_thread.stop()
     
     return 0
 
 
 if __name__ == "__main__":
-    exit_code = asyncio.run(main())
+    try:
+        # libuv-based event loop: cheaper callback dispatch for bleak/dbus-fast, if installed
+        import uvloop
+    except ImportError:
+        exit_code = asyncio.run(main())
+    else:
+        if hasattr(uvloop, "run"):  # uvloop >= 0.18
+            exit_code = uvloop.run(main())
+        else:
+            uvloop.install()
+            exit_code = asyncio.run(main())
 
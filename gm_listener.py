@@ -40,6 +40,7 @@ SETUP:
    $ python3 gm_listener.py
 
 4. Script will automatically request all stored records
+   (add --keepalive 10 to stay connected for live measurements afterwards)
 
 DEVICE ATTRIBUTES (from your device):
 =====================================
@@ -51,12 +52,25 @@ Service: 00001808-0000-1000-8000-00805f9b34fb (Glucose Service)
 - Date Time (0x2a08) - Handle 0x0012 - READ/WRITE
 """
 
+import argparse
 import asyncio
 import json
 import os
-from datetime import datetime
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional, Union
 from bleak import BleakClient, BleakScanner
 from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak.backends.device import BLEDevice
+
+try:
+    # dbus-fast is what bleak itself uses to talk to BlueZ on Linux
+    from dbus_fast import BusType, Message, MessageType
+    from dbus_fast.aio import MessageBus
+except ImportError:
+    MessageBus = None
 
 # Standard Bluetooth Glucose Service UUIDs
 GLUCOSE_SERVICE_UUID = "00001808-0000-1000-8000-00805f9b34fb"
@@ -83,16 +97,131 @@ RACP_OPERATOR_WITHIN_RANGE = 0x04
 RACP_OPERATOR_FIRST_RECORD = 0x05
 RACP_OPERATOR_LAST_RECORD = 0x06
 
+# RACP Response Code values (operand of op code 0x06)
+_RACP_RESPONSE_CODES = {
+    0x01: "Success",
+    0x02: "Op Code Not Supported",
+    0x03: "Invalid Operator",
+    0x04: "Operator Not Supported",
+    0x05: "Invalid Operand",
+    0x06: "No Records Found",
+    0x07: "Abort Unsuccessful",
+    0x08: "Procedure Not Completed",
+    0x09: "Operand Not Supported"
+}
+
+# Glucose Measurement layout: flags, sequence number and base time (10 bytes), then
+# the optional time offset, concentration (SFLOAT + type/location) and status fields
+_GM_HEADER = struct.Struct("<BHHBBBBB")
+_GM_TIME_OFFSET = struct.Struct("<h")
+_GM_CONCENTRATION = struct.Struct("<HB")
+_U16 = struct.Struct("<H")
+
+# RACP indications: op code, operator, then Request Op Code + Response Code value, or a record count
+_RACP_RESPONSE_FRAME = struct.Struct("<BBBB")
+_RACP_NUM_RECORDS_FRAME = struct.Struct("<BBH")
+
+# Reserved SFLOAT values (exponent 0), reported instead of a number
+_SFLOAT_SPECIAL = {
+    0x07FF: "NaN",
+    0x0800: "NRes",
+    0x07FE: "+INFINITY",
+    0x0802: "-INFINITY",
+    0x0801: "Reserved"
+}
+
+# Zero-padded text of every byte value, for the month..second fields of the base time
+_TWO = tuple(f"{i:02d}" for i in range(256))
+
+# 10 ** exponent for each 4-bit signed SFLOAT exponent nibble
+_SFLOAT_SCALE = tuple(10 ** (e - 16 if e >= 8 else e) for e in range(16))
+
+# Banner separators
+_SEP60 = "=" * 60
+_HASH60 = "#" * 60
+_GT60 = ">" * 60
+
+
+def _parse_racp_response_code(data):
+    """Response Code (0x06) indication"""
+    opcode, operator, request_opcode, response_code = _RACP_RESPONSE_FRAME.unpack_from(data)
+    return {"opcode": opcode, "operator": operator, "request_opcode": request_opcode,
+            "response_code": response_code,
+            "response_text": _RACP_RESPONSE_CODES.get(response_code, "Unknown")}
+
+
+def _parse_racp_num_records(data):
+    """Number of Stored Records Response (0x05) indication"""
+    opcode, operator, num_records = _RACP_NUM_RECORDS_FRAME.unpack_from(data)
+    return {"opcode": opcode, "operator": operator, "num_records": num_records}
+
+
+def _parse_racp_other(data):
+    """Any other RACP indication: op code and operator only"""
+    return {"opcode": data[0], "operator": data[1]}
+
+
+# The two RACP indications with operands: op code -> (frame layout, parser)
+_RACP_DISPATCH = {
+    RACP_OPCODE_RESPONSE_CODE: (_RACP_RESPONSE_FRAME, _parse_racp_response_code),
+    RACP_OPCODE_NUM_RESPONSE: (_RACP_NUM_RECORDS_FRAME, _parse_racp_num_records),
+}
+
+
+@dataclass
+class GMRecord:
+    """A decoded Glucose Measurement record"""
+    __slots__ = ("sequence_number", "timestamp", "glucose_value", "units", "sample_type",
+                 "sample_location", "time_offset_minutes", "status", "context_follows")
+    
+    sequence_number: int
+    timestamp: str
+    glucose_value: Union[float, str, None]
+    units: str
+    sample_type: Optional[int]
+    sample_location: Optional[int]
+    time_offset_minutes: Optional[int]
+    status: Optional[int]
+    context_follows: bool
+
 
 class GlucoseMeterListener:
     def __init__(self, config_file="config.json"):
         """Initialize the Glucose Meter listener"""
         self.config = self.load_config(config_file)
         self.device_address = self.config.get("mac_address")
+        # GATT information per MAC, shared with ble_listener.py
+        self.gatt_cache_file = self.config.get("gatt_cache_file", os.path.expanduser("~/.cache/accuchek/gatt.json"))
+        self.adapter = self.config.get("adapter", "hci0")
         self.client = None
+        # Seconds to stay connected after the RACP transfer, for live measurements
+        self.keepalive = 0
         self.measurements_received = []
-        self.racp_response_received = False
+        # Set once the RACP procedure reports its result, and when the meter disconnects
+        self._racp_done = asyncio.Event()
+        self._disconnected = asyncio.Event()
+        # Set when the meter answers the number-of-records request
+        self._racp_count_received = asyncio.Event()
         self.total_records = 0
+        # Date/time part of the last notification timestamp, reused within the same second
+        self._ts_second = None
+        self._ts_prefix = ""
+        # Notifications are stamped with perf_counter_ns(); this pair maps them back to wall-clock time
+        self._t0_ns = time.perf_counter_ns()
+        self._t0_wall_ns = time.time_ns()
+        # Notifications waiting to be decoded and printed by drain_notifications()
+        self._rx_queue = asyncio.Queue()
+        self._drain_task = None
+        # Glucose Measurement frames of a RACP dump, held back until the procedure completes
+        self._racp_pending = False
+        self._gm_frames = []
+        # Subscribed characteristics, resolved once, and their format_* methods by handle
+        self._gm_char = None
+        self._context_char = None
+        self._racp_char = None
+        self._decoder_by_handle = {}
+        # Write Request (acknowledged) unless RACP also accepts Write Without Response
+        self._racp_write_response = True
         
         if not self.device_address:
             raise ValueError("MAC address not found in config file")
@@ -105,226 +234,276 @@ class GlucoseMeterListener:
         with open(config_file, 'r') as f:
             return json.load(f)
     
-    def decode_glucose_measurement(self, data: bytearray):
-        """Decode Glucose Measurement characteristic (0x2A18) per Bluetooth spec"""
+    def load_gatt_cache(self):
+        """Return the cached GATT information for this device ({} if nothing is cached)"""
         try:
-            if len(data) < 10:
-                return {"error": "Data too short", "raw": data.hex()}
-            
-            # Byte 0: Flags
-            flags = data[0]
-            time_offset_present = bool(flags & 0x01)
-            concentration_units = "mmol/L" if (flags & 0x04) else "mg/dL"
-            status_annunciation_present = bool(flags & 0x08)
-            context_info_follows = bool(flags & 0x10)
-            
-            # Bytes 1-2: Sequence Number
-            seq_num = int.from_bytes(data[1:3], byteorder='little')
-            
-            # Bytes 3-9: Base Time
-            year = int.from_bytes(data[3:5], byteorder='little')
-            month = data[5]
-            day = data[6]
-            hour = data[7]
-            minute = data[8]
-            second = data[9]
-            timestamp = f"{year}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
-            
-            offset = 10
-            glucose_value = None
-            sample_type = None
-            sample_location = None
-            
-            # Time Offset (optional)
-            time_offset = None
-            if time_offset_present and len(data) >= offset + 2:
-                time_offset = int.from_bytes(data[offset:offset+2], byteorder='little', signed=True)
-                offset += 2
-            
-            # Glucose Concentration (3 bytes: SFLOAT + type/location)
-            if len(data) >= offset + 3:
-                # Decode SFLOAT (2 bytes)
-                glucose_raw = int.from_bytes(data[offset:offset+2], byteorder='little')
-                
-                # Check for special values
-                if glucose_raw == 0x07FF:
-                    glucose_value = "NaN"
-                elif glucose_raw == 0x0800:
-                    glucose_value = "NRes"
-                elif glucose_raw == 0x07FE:
-                    glucose_value = "+INFINITY"
-                elif glucose_raw == 0x0802:
-                    glucose_value = "-INFINITY"
-                elif glucose_raw == 0x0801:
-                    glucose_value = "Reserved"
-                else:
-                    # Decode SFLOAT: 4-bit exponent, 12-bit mantissa
-                    exponent = (glucose_raw >> 12) & 0x0F
-                    if exponent >= 0x08:
-                        exponent = -(0x10 - exponent)
-                    mantissa = glucose_raw & 0x0FFF
-                    if mantissa >= 0x0800:
-                        mantissa = -(0x1000 - mantissa)
-                    glucose_value = mantissa * (10 ** exponent)
-                
-                # Type and Location
-                type_sample_location = data[offset + 2]
-                sample_type = (type_sample_location >> 4) & 0x0F
-                sample_location = type_sample_location & 0x0F
-                offset += 3
+            with open(self.gatt_cache_file, 'r') as f:
+                return json.load(f).get(self.device_address.upper(), {})
+        except (OSError, ValueError):
+            return {}
+    
+    def save_gatt_cache(self, entry):
+        """Merge GATT information for this device into the cache file (keyed by MAC)"""
+        try:
+            with open(self.gatt_cache_file, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        
+        cache.setdefault(self.device_address.upper(), {}).update(entry)
+        
+        try:
+            os.makedirs(os.path.dirname(self.gatt_cache_file) or ".", exist_ok=True)
+            with open(self.gatt_cache_file, 'w') as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            print(f"Note: Could not write GATT cache {self.gatt_cache_file}: {e}")
+    
+    async def lookup_known_device(self):
+        """Return the meter straight from BlueZ's object cache if it is paired, else None"""
+        if MessageBus is None:
+            return None
+        
+        bus = None
+        try:
+            bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
+            reply = await bus.call(Message(
+                destination="org.bluez",
+                path="/",
+                interface="org.freedesktop.DBus.ObjectManager",
+                member="GetManagedObjects"
+            ))
+        except Exception:
+            return None
+        finally:
+            if bus is not None:
+                bus.disconnect()
+        
+        if reply.message_type != MessageType.METHOD_RETURN:
+            return None
+        
+        address = self.device_address.lower()
+        for path, interfaces in reply.body[0].items():
+            device = interfaces.get("org.bluez.Device1")
+            if device is None or not path.startswith(f"/org/bluez/{self.adapter}/"):
+                continue
             
-            # Status Annunciation (optional)
-            status = None
-            if status_annunciation_present and len(data) >= offset + 2:
-                status = int.from_bytes(data[offset:offset+2], byteorder='little')
+            props = {key: variant.value for key, variant in device.items()}
+            if props.get("Address", "").lower() != address or not props.get("Paired"):
+                continue
             
-            result = {
-                "sequence_number": seq_num,
-                "timestamp": timestamp,
-                "glucose_value": glucose_value,
-                "units": concentration_units,
-                "sample_type": sample_type,
-                "sample_location": sample_location,
-                "time_offset_minutes": time_offset,
-                "status": status,
-                "context_follows": context_info_follows,
-                "raw_hex": data.hex()
-            }
+            # Same details layout bleak's BlueZ backend uses, so BleakClient can skip its own scan
+            details = {"path": path, "props": props}
+            try:
+                return BLEDevice(props["Address"], props.get("Name"), details, props.get("RSSI", -127))
+            except TypeError:
+                # bleak >= 1.0 dropped the rssi argument
+                return BLEDevice(props["Address"], props.get("Name"), details)
+        
+        return None
+    
+    def decode_glucose_measurement(self, data: bytearray):
+        """Decode Glucose Measurement characteristic (0x2A18) per Bluetooth spec; ValueError if malformed"""
+        if len(data) < 10:
+            raise ValueError("Data too short")
+        
+        # Byte 0: Flags, bytes 1-2: Sequence Number, bytes 3-9: Base Time
+        flags, seq_num, year, month, day, hour, minute, second = _GM_HEADER.unpack_from(data)
+        time_offset_present = bool(flags & 0x01)
+        concentration_units = "mmol/L" if (flags & 0x04) else "mg/dL"
+        status_annunciation_present = bool(flags & 0x08)
+        context_info_follows = bool(flags & 0x10)
+        
+        timestamp = f"{year}-{_TWO[month]}-{_TWO[day]} {_TWO[hour]}:{_TWO[minute]}:{_TWO[second]}"
+        
+        offset = 10
+        glucose_value = None
+        sample_type = None
+        sample_location = None
+        
+        # Time Offset (optional)
+        time_offset = None
+        if time_offset_present and len(data) >= offset + 2:
+            time_offset, = _GM_TIME_OFFSET.unpack_from(data, offset)
+            offset += 2
+        
+        # Glucose Concentration (3 bytes: SFLOAT + type/location)
+        if len(data) >= offset + 3:
+            # SFLOAT (2 bytes) followed by the type/location byte
+            glucose_raw, type_sample_location = _GM_CONCENTRATION.unpack_from(data, offset)
             
-            return result
+            # Check for special values
+            glucose_value = _SFLOAT_SPECIAL.get(glucose_raw)
+            if glucose_value is None:
+                # Decode SFLOAT: 4-bit exponent (looked up as its power of ten), 12-bit mantissa
+                mantissa = glucose_raw & 0x0FFF
+                mantissa -= (mantissa & 0x0800) << 1
+                glucose_value = mantissa * _SFLOAT_SCALE[glucose_raw >> 12]
             
-        except Exception as e:
-            return {"error": str(e), "raw": data.hex()}
+            # Type and Location
+            sample_type = (type_sample_location >> 4) & 0x0F
+            sample_location = type_sample_location & 0x0F
+            offset += 3
+        
+        # Status Annunciation (optional)
+        status = None
+        if status_annunciation_present and len(data) >= offset + 2:
+            status, = _U16.unpack_from(data, offset)
+        
+        return GMRecord(seq_num, timestamp, glucose_value, concentration_units, sample_type,
+                        sample_location, time_offset, status, context_info_follows)
     
     def decode_racp_response(self, data: bytearray):
         """Decode RACP (Record Access Control Point) response"""
-        try:
-            if len(data) < 2:
-                return {"error": "Data too short", "raw": data.hex()}
-            
-            opcode = data[0]
-            operator = data[1] if len(data) > 1 else None
-            
-            response = {
-                "opcode": opcode,
-                "operator": operator,
-                "raw_hex": data.hex()
-            }
-            
-            # Response Code (0x06)
-            if opcode == RACP_OPCODE_RESPONSE_CODE:
-                if len(data) >= 4:
-                    request_opcode = data[2]
-                    response_code = data[3]
-                    
-                    response_codes = {
-                        0x01: "Success",
-                        0x02: "Op Code Not Supported",
-                        0x03: "Invalid Operator",
-                        0x04: "Operator Not Supported",
-                        0x05: "Invalid Operand",
-                        0x06: "No Records Found",
-                        0x07: "Abort Unsuccessful",
-                        0x08: "Procedure Not Completed",
-                        0x09: "Operand Not Supported"
-                    }
-                    
-                    response["request_opcode"] = request_opcode
-                    response["response_code"] = response_code
-                    response["response_text"] = response_codes.get(response_code, "Unknown")
-            
-            # Number of Records Response (0x05)
-            elif opcode == RACP_OPCODE_NUM_RESPONSE:
-                if len(data) >= 4:
-                    num_records = int.from_bytes(data[2:4], byteorder='little')
-                    response["num_records"] = num_records
-            
-            return response
-            
-        except Exception as e:
-            return {"error": str(e), "raw": data.hex()}
+        if len(data) < 2:
+            return {"error": "Data too short", "raw": data.hex()}
+        
+        # Only a response code or a record count carries operands; anything else, or a frame
+        # too short for its operands, decodes to its op code and operator
+        entry = _RACP_DISPATCH.get(data[0])
+        if entry is not None and len(data) >= entry[0].size:
+            return entry[1](data)
+        return _parse_racp_other(data)
+    
+    def format_timestamp(self, time_ns):
+        """Format a time.time_ns() value as 'YYYY-mm-dd HH:MM:SS.mmm'"""
+        seconds, nanos = divmod(time_ns, 1_000_000_000)
+        # strftime only runs when the second changes; RACP dumps arrive many per second
+        if seconds != self._ts_second:
+            self._ts_second = seconds
+            self._ts_prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
+        return f"{self._ts_prefix}.{nanos // 1_000_000:03d}"
     
     def notification_handler(self, sender: BleakGATTCharacteristic, data: bytearray):
         """Handle notifications from glucose meter"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        uuid = sender.uuid.lower()
-        
-        print(f"\n{'='*60}")
-        print(f"📨 NOTIFICATION RECEIVED [{timestamp}]")
-        print(f"{'='*60}")
-        print(f"Characteristic: {sender.uuid}")
-        print(f"Handle: {sender.handle}")
-        print(f"Raw Data (hex): {data.hex()}")
-        print(f"Raw Data (bytes): {list(data)}")
-        
-        # Glucose Measurement
-        if uuid == GLUCOSE_MEASUREMENT_UUID:
-            print(f"\n🩸 GLUCOSE MEASUREMENT:")
+        # Only queue the payload; decoding and printing happen in drain_notifications() so
+        # the callback returns straight away during a RACP dump
+        if self._racp_pending and sender is self._gm_char:
+            self._gm_frames.append((time.perf_counter_ns(), sender, data))
+        else:
+            self._rx_queue.put_nowait((time.perf_counter_ns(), sender, data))
+    
+    async def drain_notifications(self):
+        """Background task: decode and print notifications as they are queued"""
+        while True:
+            sys.stdout.write(self.format_queued(await self._rx_queue.get()))
+    
+    def format_queued(self, item):
+        """format_notification() for a queued item; a frame that fails to decode is reported, not raised"""
+        try:
+            return self.format_notification(*item)
+        except Exception as e:
+            # Raising here would end drain_notifications() and silence every later notification
+            return f"\n❌ Could not process notification: {type(e).__name__}: {e}\n"
+    
+    def flush_gm_frames(self):
+        """Decode and print the held-back RACP dump as a single write"""
+        if self._gm_frames:
+            frames, self._gm_frames = self._gm_frames, []
+            sys.stdout.write("".join(self.format_queued(frame) for frame in frames))
+    
+    def flush_notifications(self):
+        """Decode and print any notifications still waiting in the queue"""
+        while not self._rx_queue.empty():
+            sys.stdout.write(self.format_queued(self._rx_queue.get_nowait()))
+        self.flush_gm_frames()
+    
+    def format_glucose_measurement(self, data: bytearray, out):
+        """Append the decoded Glucose Measurement (0x2A18) to out and record it"""
+        out.append(f"\n🩸 GLUCOSE MEASUREMENT:")
+        try:
             decoded = self.decode_glucose_measurement(data)
+        except ValueError as e:
+            out.append(f"  ⚠ Decode Error: {e}")
+            return
+        
+        out.append(f"  Sequence #: {decoded.sequence_number}")
+        out.append(f"  Timestamp: {decoded.timestamp}")
+        out.append(f"  ⭐ GLUCOSE: {decoded.glucose_value} {decoded.units}")
+        if decoded.sample_type is not None:
+            out.append(f"  Sample Type: {decoded.sample_type}")
+        if decoded.sample_location is not None:
+            out.append(f"  Sample Location: {decoded.sample_location}")
+        if decoded.time_offset_minutes is not None:
+            out.append(f"  Time Offset: {decoded.time_offset_minutes} min")
+        if decoded.status is not None:
+            out.append(f"  Status: 0x{decoded.status:04x}")
+        
+        self.measurements_received.append(decoded)
+    
+    def format_glucose_context(self, data: bytearray, out):
+        """Append the Glucose Measurement Context (0x2A34) to out"""
+        out.append(f"\n📋 GLUCOSE MEASUREMENT CONTEXT:")
+        out.append(f"  (Additional context data)")
+        # Context decoding can be added if needed
+    
+    def format_racp_response(self, data: bytearray, out):
+        """Append the decoded RACP (0x2A52) response to out and track its state"""
+        out.append(f"\n📝 RACP RESPONSE:")
+        decoded = self.decode_racp_response(data)
+        
+        if "error" in decoded:
+            out.append(f"  ⚠ Decode Error: {decoded['error']}")
+        elif "response_text" in decoded:
+            # The procedure is over: print the stored records ahead of this response
+            self._racp_pending = False
+            self.flush_gm_frames()
             
-            if "error" not in decoded:
-                print(f"  Sequence #: {decoded['sequence_number']}")
-                print(f"  Timestamp: {decoded['timestamp']}")
-                print(f"  ⭐ GLUCOSE: {decoded['glucose_value']} {decoded['units']}")
-                if decoded['sample_type'] is not None:
-                    print(f"  Sample Type: {decoded['sample_type']}")
-                if decoded['sample_location'] is not None:
-                    print(f"  Sample Location: {decoded['sample_location']}")
-                if decoded['time_offset_minutes'] is not None:
-                    print(f"  Time Offset: {decoded['time_offset_minutes']} min")
-                if decoded['status'] is not None:
-                    print(f"  Status: 0x{decoded['status']:04x}")
-                
-                self.measurements_received.append(decoded)
-            else:
-                print(f"  ⚠ Decode Error: {decoded['error']}")
-        
-        # Glucose Measurement Context
-        elif uuid == GLUCOSE_CONTEXT_UUID:
-            print(f"\n📋 GLUCOSE MEASUREMENT CONTEXT:")
-            print(f"  (Additional context data)")
-            # Context decoding can be added if needed
-        
-        # RACP Response
-        elif uuid == RACP_UUID:
-            print(f"\n📝 RACP RESPONSE:")
-            decoded = self.decode_racp_response(data)
-            
-            if "response_text" in decoded:
-                print(f"  Response: {decoded['response_text']}")
-                print(f"  Response Code: {decoded['response_code']}")
-                if decoded['response_text'] == "Success":
-                    print(f"  ✅ Operation completed successfully!")
-                    self.racp_response_received = True
-                elif decoded['response_text'] == "No Records Found":
-                    print(f"  ℹ️  No glucose records stored on device")
-                    self.racp_response_received = True
-            elif "num_records" in decoded:
-                print(f"  Number of Records: {decoded['num_records']}")
-                self.total_records = decoded['num_records']
-            else:
-                print(f"  Opcode: 0x{decoded['opcode']:02x}")
-                if decoded['operator'] is not None:
-                    print(f"  Operator: 0x{decoded['operator']:02x}")
+            out.append(f"  Response: {decoded['response_text']}")
+            out.append(f"  Response Code: {decoded['response_code']}")
+            if decoded['response_text'] == "Success":
+                out.append(f"  ✅ Operation completed successfully!")
+                self._racp_done.set()
+            elif decoded['response_text'] == "No Records Found":
+                out.append(f"  ℹ️  No glucose records stored on device")
+                self._racp_done.set()
+        elif "num_records" in decoded:
+            out.append(f"  Number of Records: {decoded['num_records']}")
+            self.total_records = decoded['num_records']
+            self._racp_count_received.set()
+        else:
+            out.append(f"  Opcode: 0x{decoded['opcode']:02x}")
+            if decoded['operator'] is not None:
+                out.append(f"  Operator: 0x{decoded['operator']:02x}")
+    
+    def format_notification(self, received_ns, sender: BleakGATTCharacteristic, data: bytearray):
+        """Decode a queued notification and return the text to print for it"""
+        timestamp = self.format_timestamp(self._t0_wall_ns + (received_ns - self._t0_ns))
+        
+        # Collected into one string, written by the caller with a single call
+        out = [f"\n{_SEP60}"]
+        out.append(f"📨 NOTIFICATION RECEIVED [{timestamp}]")
+        out.append(f"{_SEP60}")
+        out.append(f"Characteristic: {sender.uuid}")
+        out.append(f"Handle: {sender.handle}")
+        out.append(f"Raw Data (hex): {data.hex()}")
+        out.append(f"Raw Data (bytes): {data.hex(' ')}")
+        
+        # Glucose Measurement / Context / RACP decoding, looked up by handle
+        decoder = self._decoder_by_handle.get(sender.handle)
+        if decoder is not None:
+            decoder(data, out)
         
         else:
-            print(f"\n📦 OTHER DATA:")
-            # Try to decode as text
-            try:
-                text = data.decode('utf-8')
-                print(f"  Text: {text}")
-            except:
-                pass
+            out.append(f"\n📦 OTHER DATA:")
+            # Try to decode as text; isascii() turns binary payloads away without raising
+            if data.isascii():
+                out.append(f"  Text: {data.decode('ascii')}")
         
-        print(f"{'='*60}\n")
+        out.append(f"{_SEP60}\n")
+        return "\n".join(out) + "\n"
+    
+    def on_disconnect(self, client):
+        """disconnected_callback for BleakClient"""
+        self._disconnected.set()
     
     async def write_racp_command(self, opcode, operator):
         """Write command to RACP characteristic to request glucose records"""
         command = bytearray([opcode, operator])
         
-        print(f"\n{'>'*60}")
+        print(f"\n{_GT60}")
         print(f"📤 WRITING RACP COMMAND")
-        print(f"{'>'*60}")
+        print(f"{_GT60}")
         print(f"Characteristic: {RACP_UUID}")
         print(f"Command: {command.hex()} (OpCode: 0x{opcode:02x}, Operator: 0x{operator:02x})")
         
@@ -338,163 +517,206 @@ class GlucoseMeterListener:
             print(f"Action: Request LAST (newest) record")
         
         try:
-            await self.client.write_gatt_char(RACP_UUID, command, response=True)
+            # Without a response the command goes out with no ATT round-trip; the result
+            # arrives as a RACP indication either way
+            await self.client.write_gatt_char(self._racp_char or RACP_UUID, command,
+                                              response=self._racp_write_response)
             print(f"✅ Command sent successfully!")
-            print(f"{'>'*60}\n")
+            print(f"{_GT60}\n")
             return True
         except Exception as e:
             print(f"❌ Failed to send command: {e}")
-            print(f"{'>'*60}\n")
+            print(f"{_GT60}\n")
             return False
     
     async def connect_and_retrieve_data(self):
         """Connect to glucose meter and retrieve stored measurements"""
-        print(f"\n{'#'*60}")
+        print(f"\n{_HASH60}")
         print(f"  GLUCOSE METER LISTENER - Reliable RACP Method")
-        print(f"{'#'*60}\n")
+        print(f"{_HASH60}\n")
         
         print(f"Target Device: {self.device_address}")
         print(f"Method: Bluetooth Glucose Profile with RACP\n")
         
-        # Scan for device
-        print(f"{'='*60}")
-        print("🔍 SCANNING FOR DEVICE...")
-        print(f"{'='*60}\n")
-        print("⚠️  IMPORTANT: Make sure your glucose meter is:")
-        print("   • Powered on and awake")
-        print("   • In pairing/active mode")
-        print("   • Not connected to other devices\n")
-        
-        devices = await BleakScanner.discover(timeout=10)
-        device_found = False
-        
-        for device in devices:
-            if device.address.lower() == self.device_address.lower():
+        # A paired meter can be taken from BlueZ's object cache and connected straight away;
+        # cached service UUIDs only narrow the GATT resolution, they do not replace the scan
+        service_uuids = self.load_gatt_cache().get("service_uuids")
+        device = await self.lookup_known_device()
+        if device is not None:
+            print(f"✅ Found paired device in BlueZ: {device.name or 'Unknown'} ({device.address}) - skipping scan")
+        else:
+            # Scan for device
+            print(f"{_SEP60}")
+            print("🔍 SCANNING FOR DEVICE...")
+            print(f"{_SEP60}\n")
+            print("⚠️  IMPORTANT: Make sure your glucose meter is:")
+            print("   • Powered on and awake")
+            print("   • In pairing/active mode")
+            print("   • Not connected to other devices\n")
+            
+            # Returns as soon as the meter advertises instead of always scanning for 10 seconds
+            device = await BleakScanner.find_device_by_address(self.device_address, timeout=10)
+            
+            if device is not None:
                 print(f"✅ Device found: {device.name or 'Unknown'} ({device.address})")
-                device_found = True
-                break
-        
-        if not device_found:
-            print(f"⚠️  Device not found in scan, attempting direct connection...")
+            else:
+                print(f"⚠️  Device not found in scan, attempting direct connection...")
+            
         
         # Connect
-        print(f"\n{'='*60}")
+        print(f"\n{_SEP60}")
         print("🔗 CONNECTING TO DEVICE...")
-        print(f"{'='*60}\n")
+        print(f"{_SEP60}\n")
         
         try:
-            async with BleakClient(self.device_address, timeout=30.0) as client:
+            # With services= BlueZ only resolves the listed services instead of the whole GATT table
+            # Given a BLEDevice (from BlueZ or the scan) bleak connects straight away; given a bare
+            # address it runs a scan of its own first
+            async with BleakClient(device or self.device_address, timeout=30.0, services=service_uuids,
+                                   disconnected_callback=self.on_disconnect) as client:
                 self.client = client
+                self._t0_ns = time.perf_counter_ns()
+                self._t0_wall_ns = time.time_ns()
+                
+                if not service_uuids:
+                    service_uuids = [service.uuid for service in client.services]
+                    if service_uuids:
+                        self.save_gatt_cache({"service_uuids": service_uuids})
                 
                 print(f"✅ Connected successfully!")
                 print(f"   Device: {client.address}")
                 print(f"   Connected: {client.is_connected}\n")
                 
                 # Subscribe to characteristics
-                print(f"{'='*60}")
+                print(f"{_SEP60}")
                 print("📡 SUBSCRIBING TO CHARACTERISTICS...")
-                print(f"{'='*60}\n")
+                print(f"{_SEP60}\n")
                 
                 subscribed = []
                 
-                # Subscribe to Glucose Measurement
-                try:
-                    print(f"Subscribing to Glucose Measurement (0x2a18)...", end=" ")
-                    await client.start_notify(GLUCOSE_MEASUREMENT_UUID, self.notification_handler)
-                    print("✅")
-                    subscribed.append("Glucose Measurement")
-                    await asyncio.sleep(0.5)
-                except Exception as e:
-                    print(f"❌ ({e})")
+                self._gm_char = client.services.get_characteristic(GLUCOSE_MEASUREMENT_UUID)
+                self._context_char = client.services.get_characteristic(GLUCOSE_CONTEXT_UUID)
+                self._racp_char = client.services.get_characteristic(RACP_UUID)
+                self._racp_write_response = (self._racp_char is None
+                                             or "write-without-response" not in self._racp_char.properties)
+                self._decoder_by_handle = {
+                    char.handle: decoder
+                    for char, decoder in (
+                        (self._gm_char, self.format_glucose_measurement),
+                        (self._context_char, self.format_glucose_context),
+                        (self._racp_char, self.format_racp_response),
+                    )
+                    if char is not None
+                }
                 
-                # Subscribe to Glucose Context (optional, may not be supported)
-                try:
-                    print(f"Subscribing to Glucose Context (0x2a34)...", end=" ")
-                    await client.start_notify(GLUCOSE_CONTEXT_UUID, self.notification_handler)
-                    print("✅")
-                    subscribed.append("Glucose Context")
-                    await asyncio.sleep(0.5)
-                except Exception as e:
-                    print(f"⚠️  (Not available - OK, optional)")
+                # Glucose Measurement, Glucose Context (optional, may not be supported) and
+                # RACP (REQUIRED for responses), all subscribed at once
+                characteristics = [
+                    ("Glucose Measurement", "0x2a18", GLUCOSE_MEASUREMENT_UUID),
+                    ("Glucose Context", "0x2a34", GLUCOSE_CONTEXT_UUID),
+                    ("RACP", "0x2a52", RACP_UUID),
+                ]
+                results = await asyncio.gather(
+                    *(client.start_notify(uuid, self.notification_handler) for _, _, uuid in characteristics),
+                    return_exceptions=True
+                )
                 
-                # Subscribe to RACP (REQUIRED for responses)
-                try:
-                    print(f"Subscribing to RACP (0x2a52)...", end=" ")
-                    await client.start_notify(RACP_UUID, self.notification_handler)
-                    print("✅")
-                    subscribed.append("RACP")
-                    await asyncio.sleep(0.5)
-                except Exception as e:
-                    print(f"❌ ({e})")
+                for (name, short_uuid, uuid), result in zip(characteristics, results):
+                    if not isinstance(result, Exception):
+                        print(f"Subscribing to {name} ({short_uuid})... ✅")
+                        subscribed.append(name)
+                    elif uuid == GLUCOSE_CONTEXT_UUID:
+                        print(f"Subscribing to {name} ({short_uuid})... ⚠️  (Not available - OK, optional)")
+                    else:
+                        print(f"Subscribing to {name} ({short_uuid})... ❌ ({result})")
+                
+                if "RACP" not in subscribed:
                     print(f"\n❌ ERROR: RACP subscription failed. Cannot proceed.")
                     return
                 
                 print(f"\n✅ Subscribed to {len(subscribed)} characteristic(s)")
                 print(f"   {', '.join(subscribed)}\n")
                 
+                self._drain_task = asyncio.create_task(self.drain_notifications())
+                
                 # Wait a moment for subscriptions to stabilize
                 await asyncio.sleep(1)
                 
                 # REQUEST STORED RECORDS via RACP - THIS IS THE KEY!
-                print(f"{'='*60}")
+                print(f"{_SEP60}")
                 print("🚀 REQUESTING GLUCOSE RECORDS...")
-                print(f"{'='*60}\n")
+                print(f"{_SEP60}\n")
                 
                 # Optional: First ask how many records
                 print("Step 1: Checking number of stored records...")
                 await self.write_racp_command(RACP_OPCODE_REPORT_NUM_RECORDS, RACP_OPERATOR_ALL_RECORDS)
-                await asyncio.sleep(2)
+                try:
+                    await asyncio.wait_for(self._racp_count_received.wait(), timeout=2)
+                except asyncio.TimeoutError:
+                    print("⚠️  No record count received, requesting records anyway")
                 
                 # Request all stored records
                 print("\nStep 2: Requesting all stored glucose records...")
+                self._racp_pending = True
                 success = await self.write_racp_command(
                     RACP_OPCODE_REPORT_STORED_RECORDS,
                     RACP_OPERATOR_ALL_RECORDS
                 )
                 
                 if not success:
+                    self._racp_pending = False
                     print("\n❌ Failed to send RACP command")
                     return
                 
                 # Wait for data
-                print(f"\n{'='*60}")
+                print(f"\n{_SEP60}")
                 print("⏳ WAITING FOR GLUCOSE DATA...")
-                print(f"{'='*60}\n")
+                print(f"{_SEP60}\n")
                 print("Device should now send stored glucose measurements...")
                 print("Waiting up to 30 seconds for data...\n")
                 
-                # Listen for responses (max 30 seconds)
+                # Listen for responses (max 30 seconds), returning as soon as RACP completes
                 timeout = 30
-                elapsed = 0
+                started = time.monotonic()
+                waiters = [asyncio.ensure_future(self._racp_done.wait()),
+                           asyncio.ensure_future(self._disconnected.wait())]
+                try:
+                    for elapsed in range(5, timeout + 5, 5):
+                        done, _ = await asyncio.wait(waiters, timeout=5, return_when=asyncio.FIRST_COMPLETED)
+                        if done:
+                            break
+                        
+                        # Show progress every 5 seconds
+                        if elapsed < timeout:
+                            print(f"[{elapsed}s] Still listening... ({len(self.measurements_received) + len(self._gm_frames)} measurements received so far)")
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+                    # However the wait ended (result, timeout, disconnect), later measurements are live
+                    self._racp_pending = False
                 
-                while elapsed < timeout and not self.racp_response_received:
-                    if not client.is_connected:
-                        print(f"\n⚠️  Device disconnected after {elapsed}s")
-                        break
-                    
-                    await asyncio.sleep(1)
-                    elapsed += 1
-                    
-                    # Show progress every 5 seconds
-                    if elapsed % 5 == 0 and elapsed < timeout:
-                        print(f"[{elapsed}s] Still listening... ({len(self.measurements_received)} measurements received so far)")
+                if self._disconnected.is_set() and not self._racp_done.is_set():
+                    print(f"\n⚠️  Device disconnected after {int(time.monotonic() - started)}s")
+                
+                # Anything still queued counts towards the summary
+                self.flush_notifications()
                 
                 # Summary
-                print(f"\n{'='*60}")
+                print(f"\n{_SEP60}")
                 print("📊 SUMMARY")
-                print(f"{'='*60}\n")
+                print(f"{_SEP60}\n")
                 
                 if len(self.measurements_received) > 0:
                     print(f"✅ SUCCESS! Received {len(self.measurements_received)} glucose measurement(s):\n")
                     
                     for i, measurement in enumerate(self.measurements_received, 1):
-                        print(f"{i}. Seq #{measurement['sequence_number']}: "
-                              f"{measurement['glucose_value']} {measurement['units']} "
-                              f"at {measurement['timestamp']}")
+                        print(f"{i}. Seq #{measurement.sequence_number}: "
+                              f"{measurement.glucose_value} {measurement.units} "
+                              f"at {measurement.timestamp}")
                     
                     print(f"\n🎉 Glucose data successfully retrieved using RACP method!")
                 else:
-                    if self.racp_response_received:
+                    if self._racp_done.is_set():
                         print(f"ℹ️  No glucose measurements stored on device")
                         print(f"   Device responded successfully but has no records")
                         print(f"   Try taking a measurement first")
@@ -506,17 +728,18 @@ class GlucoseMeterListener:
                         print(f"   - Device requires authentication/pairing")
                         print(f"   - RACP command not supported by this device")
                 
-                print(f"\n{'='*60}\n")
+                print(f"\n{_SEP60}\n")
                 
-                # Keep connection alive a bit longer
-                print("Keeping connection alive for 10 more seconds...")
-                print("(Take a measurement now if you want to test live data)\n")
-                
-                for i in range(10):
-                    if not client.is_connected:
+                # Keep connection alive a bit longer, if asked to
+                if self.keepalive > 0:
+                    print(f"Keeping connection alive for {self.keepalive} more seconds...")
+                    print("(Take a measurement now if you want to test live data)\n")
+                    
+                    try:
+                        await asyncio.wait_for(self._disconnected.wait(), timeout=self.keepalive)
                         print(f"Device disconnected")
-                        break
-                    await asyncio.sleep(1)
+                    except asyncio.TimeoutError:
+                        pass
                 
         except asyncio.TimeoutError:
             print(f"\n❌ Connection timeout - device not responding")
@@ -534,9 +757,9 @@ class GlucoseMeterListener:
             
             # Special handling for BleakDBusError
             if "DBus" in error_type or "DBus" in error_msg or "org.bluez" in error_msg:
-                print(f"\n{'='*60}")
+                print(f"\n{_SEP60}")
                 print("⚠️  BLEAKDBUSERROR DETECTED!")
-                print(f"{'='*60}")
+                print(f"{_SEP60}")
                 print("\nThis is a Linux Bluetooth/DBus communication error.")
                 print("\nQUICK FIXES (try in order):")
                 print(f"\n1. Restart Bluetooth service:")
@@ -556,30 +779,47 @@ class GlucoseMeterListener:
                 print(f"   bluetoothctl info {self.device_address}")
                 print(f"   If connected, disconnect first:")
                 print(f"   bluetoothctl disconnect {self.device_address}")
-                print(f"{'='*60}\n")
+                print(f"{_SEP60}\n")
             else:
-                print(f"\n{'='*60}")
+                print(f"\n{_SEP60}")
                 print("TROUBLESHOOTING:")
-                print(f"{'='*60}")
+                print(f"{_SEP60}")
                 print(f"\n1. Ensure device is paired:")
                 print(f"   bluetoothctl pair {self.device_address}")
                 print(f"   bluetoothctl trust {self.device_address}")
                 print(f"\n2. Make sure device is awake and in pairing mode")
                 print(f"\n3. Check that device supports Glucose Service (0x1808)")
                 print(f"\n4. Some devices require time sync before sending data")
-                print(f"{'='*60}\n")
+                print(f"{_SEP60}\n")
+        
+        finally:
+            if self._drain_task is not None:
+                self._drain_task.cancel()
+                self._drain_task = None
+            self.flush_notifications()
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Retrieve stored glucose records from a BLE glucose meter via RACP")
+    parser.add_argument("--keepalive", type=int, default=0, metavar="SECONDS",
+                        help="stay connected this many seconds after the transfer to receive live "
+                             "measurements (default: 0, disconnect straight away)")
+    return parser.parse_args()
 
 
 async def main():
     """Main entry point"""
+    args = parse_args()
     try:
-        print("\n" + "="*60)
+        print("\n" + _SEP60)
         print("  🩺 GLUCOSE METER LISTENER")
         print("  Using: RACP (Record Access Control Point) Method")
         print("  Most Reliable Standard Bluetooth Glucose Profile")
-        print("="*60 + "\n")
+        print(_SEP60 + "\n")
         
         listener = GlucoseMeterListener()
+        listener.keepalive = args.keepalive
         await listener.connect_and_retrieve_data()
         
     except KeyboardInterrupt:
@@ -597,6 +837,16 @@ async def main():
 
 
 if __name__ == "__main__":
-    exit_code = asyncio.run(main())
+    try:
+        # libuv-based event loop: cheaper callback dispatch for bleak/dbus-fast, if installed
+        import uvloop
+    except ImportError:
+        exit_code = asyncio.run(main())
+    else:
+        if hasattr(uvloop, "run"):  # uvloop >= 0.18
+            exit_code = uvloop.run(main())
+        else:
+            uvloop.install()
+            exit_code = asyncio.run(main())
     exit(exit_code)
 